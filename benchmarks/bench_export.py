@@ -0,0 +1,59 @@
+"""
+Benchmark of the exported controllers (see `export.py`): time to decide on a batch of (v, h, g) states by calling
+`Individual.eval` for each state and by one call of the exported NumPy module. The outputs of both are checked to be
+equal on random states first.
+
+Run from the repository root: python benchmarks/bench_export.py
+"""
+import os
+import random
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cgp
+from export import check_controller, export_controller, load_controller, random_states
+from settings import *
+from world import HeadlessGame
+
+BATCH_SIZES = [1, 10, 100, 1000, 10000]
+N_GENERATIONS = 5
+
+
+def evolved_controllers():
+    """
+    The parents after a few generations in the headless world with a fixed seed.
+    """
+    random.seed(RANDOM_SEED)
+    cgp.seed(RANDOM_SEED)
+    game = HeadlessGame(n_workers=None)
+    while game.current_generation < N_GENERATIONS:
+        game.reset()
+        game.run()
+    return game.pop[:MU]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for i, ind in enumerate(evolved_controllers()):
+            file = os.path.join(tmp_dir, f'controller{i}.py')
+            export_controller(ind, file, score=ind.fitness)
+            module = load_controller(file)
+            assert check_controller(ind, module), 'the exported controller computes different outputs'
+            print(f'Controller {i} (score {ind.fitness}, {ind._determine_active_nodes()} active nodes): '
+                  f'same outputs on random states')
+            print(f"{'batch':>8} {'eval (us/state)':>16} {'exported (us/state)':>20} {'speedup':>8}")
+            for n in BATCH_SIZES:
+                states = random_states(n)
+                rows = states.tolist()
+                number = max(1, 10000 // n)
+                t_eval = min(timeit.repeat(lambda: [ind.eval(*row) > 0 for row in rows], number=number,
+                                           repeat=5)) / number / n
+                t_exported = min(timeit.repeat(lambda: module.flap(states), number=number, repeat=5)) / number / n
+                print(f'{n:>8} {t_eval * 1e6:>16.3f} {t_exported * 1e6:>20.3f} {t_eval / t_exported:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
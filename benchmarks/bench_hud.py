@@ -0,0 +1,55 @@
+"""
+Benchmark of the HUD text rendering: time to draw the HUD lines of a frame when the fonts are looked up and the text is
+rendered for every line in every frame (the previous implementation), and with the cached HUD.
+
+Run from the repository root: python benchmarks/bench_hud.py
+"""
+import os
+import sys
+import timeit
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame as pg
+
+import cgp
+from game import Game
+from settings import *
+
+N_FRAMES = 200
+
+
+def uncached_draw_text(game, text, x, y, color=WHITE, font=FONT_NAME, size=FONT_SIZE):
+    font = pg.font.SysFont(font, size)
+    text_surface = font.render(text, True, color)
+    game._screen.blit(text_surface, (x, y))
+
+
+def time_frames(game):
+    """
+    Mean time (ms) of drawing the HUD lines of a frame, where the score changes in every frame like in the game.
+    """
+    def frame():
+        game._max_score += 1
+        lines = [f'Score: {game._max_score}', f'Max score so far: {game._max_score_so_far}',
+                 f'Generation: {game.current_generation}', f'Alive: {game._world.n_alive} / {game.n_birds}']
+        for i, line in enumerate(lines):
+            game._draw_text(line, 10, 10 + i * (FONT_SIZE + 2))
+    return timeit.timeit(frame, number=N_FRAMES) / N_FRAMES * 1e3
+
+
+def main():
+    cgp.seed(0)
+    game = Game()
+    game.reset()
+    t_cached = time_frames(game)
+    game._draw_text = lambda *args, **kwargs: uncached_draw_text(game, *args, **kwargs)
+    t_uncached = time_frames(game)
+    print(f'Frame time (ms) with uncached text: {t_uncached:.3f}, with the HUD cache: {t_cached:.3f}, '
+          f'speedup: {t_uncached / t_cached:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
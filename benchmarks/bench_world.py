@@ -0,0 +1,55 @@
+"""
+Benchmark of the world (see `world.World`) with large populations: time of a simulation step for different numbers
+of birds, split into the CGP evaluation of the birds (`flap_birds`) and the rest of the step (`update`: collisions,
+physics, scrolling and scores), which is performed with whole-array operations.
+
+Run from the repository root: python benchmarks/bench_world.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cgp
+from world import World
+
+BIRD_COUNTS = [10, 100, 1000, 10000, 30000]
+N_STEPS = 30  # steps per round, short enough for most random birds to survive
+
+
+def time_steps(n_birds):
+    """
+    :return: mean time (s) per step of (flap_birds, update) and the mean number of alive birds
+    """
+    random.seed(0)
+    cgp.seed(0)
+    world = World()
+    world.reset(cgp.create_population(n_birds))
+    for brain in world.brains:  # compile before timing
+        brain.compile()
+    t_eval = t_update = n_alive = 0
+    for _ in range(N_STEPS):
+        n_alive += world.n_alive
+        start = time.perf_counter()
+        world.flap_birds()
+        t_eval += time.perf_counter() - start
+        start = time.perf_counter()
+        alive = world.update()
+        t_update += time.perf_counter() - start
+        if not alive:
+            break
+    return t_eval / N_STEPS, t_update / N_STEPS, n_alive / N_STEPS
+
+
+def main():
+    print(f"{'# birds':>8} {'alive':>8} {'eval (ms)':>10} {'update (ms)':>12} {'update (us/bird)':>17}")
+    for n_birds in BIRD_COUNTS:
+        t_eval, t_update, n_alive = time_steps(n_birds)
+        print(f'{n_birds:>8} {n_alive:>8.0f} {t_eval * 1e3:>10.3f} {t_update * 1e3:>12.3f} '
+              f'{t_update / n_alive * 1e6:>17.3f}')
+
+
+if __name__ == '__main__':
+    main()
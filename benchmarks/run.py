@@ -0,0 +1,201 @@
+"""
+Benchmark suite of the hot paths of CGP and the game.
+
+Each benchmark measures the time of one operation (the best of several repeats to reduce noise) and is compared with
+the baseline stored in `benchmarks/baseline.json`. A benchmark whose time increases by more than the threshold is
+flagged as a regression, in which case the exit status is 1.
+
+Run from the repository root:
+    python benchmarks/run.py                  # compare with the baseline
+    python benchmarks/run.py --save           # store the current results as the new baseline
+    python benchmarks/run.py -k game -t 0.2   # only the benchmarks whose name contains 'game', 20% threshold
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import timeit
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.chdir(ROOT_DIR)  # images and sounds are loaded from relative paths
+
+import cgp
+from settings import *
+
+BASELINE_FILE = os.path.join(ROOT_DIR, 'benchmarks', 'baseline.json')
+DEFAULT_THRESHOLD = 0.1
+N_REPEATS = 7
+GAME_POPULATION_SIZES = [10, 100, 1000, 10000]
+GAME_N_FRAMES = 20  # frames per round in the game benchmarks, short enough for most random birds to survive
+
+
+def _time_per_op(stmt, number, setup=None):
+    """
+    Best time (s) of a single call of *stmt* among N_REPEATS repeats of *number* calls each.
+    *setup* is called before each repeat and not timed.
+    """
+    timer = timeit.Timer(stmt, setup=setup or (lambda: None))
+    return min(timer.repeat(N_REPEATS, number)) / number
+
+
+def _individuals(n, seed=0):
+    cgp.seed(seed)
+    return cgp.create_population(n)
+
+
+def bench_eval():
+    inds = _individuals(10)
+    for ind in inds:
+        ind.compile()
+
+    def eval_all():
+        for ind in inds:
+            ind.eval(10.0, 20.0, 100.0)
+    return _time_per_op(eval_all, 2000) / len(inds)
+
+
+def bench_mutate():
+    inds = _individuals(10)
+
+    def mutate_all():
+        for ind in inds:
+            ind.mutate(MUT_PB)
+    return _time_per_op(mutate_all, 100) / len(inds)
+
+
+def bench_evolve():
+    pop = _individuals(MU + LAMBDA)
+    rng = random.Random(0)
+    for ind in pop:
+        ind.fitness = rng.randrange(1000)
+    return _time_per_op(lambda: cgp.evolve(pop, MUT_PB, MU, LAMBDA), 100)
+
+
+def bench_determine_active_nodes():
+    inds = _individuals(10)
+
+    def determine_all():
+        for ind in inds:
+            ind._determine_active_nodes()
+    return _time_per_op(determine_all, 100) / len(inds)
+
+
+def _bench_game_update(n_birds):
+    from game import Game
+
+    random.seed(0)
+    cgp.seed(0)
+    game = Game()
+    game.n_birds = n_birds
+    game.pop = cgp.create_population(n_birds)
+
+    def new_round():
+        game.reset()
+        game.playing = True
+
+    def play_round():
+        for _ in range(GAME_N_FRAMES):
+            game.update()
+    return _time_per_op(play_round, 1, setup=new_round) / GAME_N_FRAMES
+
+
+def _evolved_graphs():
+    """
+    The computational graphs of the parents after a few generations in the headless world with a fixed seed.
+    """
+    from postprocessing import extract_computational_subgraph
+    from world import HeadlessGame
+
+    random.seed(RANDOM_SEED)
+    cgp.seed(RANDOM_SEED)
+    game = HeadlessGame(n_workers=None)
+    while game.current_generation < 3:
+        game.reset()
+        game.run()
+    return [extract_computational_subgraph(ind) for ind in game.pop[:MU]]
+
+
+def bench_simplify():
+    import postprocessing
+
+    graphs = _evolved_graphs()
+
+    def simplify_all():
+        for g in graphs:
+            postprocessing.simplify(g, ['v', 'h', 'g'])
+    # the simplified formulas are memoized
+    return _time_per_op(simplify_all, 1, setup=postprocessing._simplified_expressions.clear) / len(graphs)
+
+
+BENCHMARKS = {
+    'cgp.eval': bench_eval,
+    'cgp.mutate': bench_mutate,
+    'cgp.evolve': bench_evolve,
+    'cgp.determine_active_nodes': bench_determine_active_nodes,
+    **{f'game.update[{n}]': (lambda n=n: _bench_game_update(n)) for n in GAME_POPULATION_SIZES},
+    'postprocessing.simplify': bench_simplify,
+}
+
+
+def load_baseline(file=BASELINE_FILE):
+    if not os.path.exists(file):
+        return {}
+    with open(file) as f:
+        return json.load(f)['results']
+
+
+def save_baseline(results, file=BASELINE_FILE):
+    with open(file, 'w') as f:
+        json.dump({'machine': platform.platform(), 'python': platform.python_version(), 'results': results},
+                  f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Print a table of the results against the baseline.
+    :return: the names of the benchmarks that regressed by more than *threshold*
+    """
+    regressions = []
+    print(f"{'benchmark':<28} {'baseline (us)':>14} {'current (us)':>13} {'ops/s':>10} {'change':>8}")
+    for name, t in results.items():
+        t_base = baseline.get(name)
+        if t_base is None:
+            base, change, flag = '-', '-', 'new'
+        else:
+            base, change, flag = f'{t_base * 1e6:.2f}', f'{t / t_base - 1:+.1%}', ''
+            if t > t_base * (1 + threshold):
+                flag = 'REGRESSION'
+                regressions.append(name)
+            elif t < t_base * (1 - threshold):
+                flag = 'faster'
+        print(f'{name:<28} {base:>14} {t * 1e6:>13.2f} {1 / t:>10.0f} {change:>8}  {flag}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the benchmark suite and compare it with the baseline.')
+    parser.add_argument('-k', '--filter', default='', help='only run the benchmarks whose name contains this string')
+    parser.add_argument('-t', '--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='relative slowdown flagged as a regression (default: %(default)s)')
+    parser.add_argument('--save', action='store_true', help='save the results as the new baseline')
+    args = parser.parse_args()
+
+    results = {name: bench() for name, bench in BENCHMARKS.items() if args.filter in name}
+    baseline = load_baseline()
+    regressions = compare(results, baseline, args.threshold)
+    if args.save:
+        save_baseline({**baseline, **results})
+        print(f'Baseline saved to {BASELINE_FILE}')
+    elif regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
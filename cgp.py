@@ -2,21 +2,37 @@
 Cartesian genetic programming
 """
 import operator as op
-import random
-import copy
-import math
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
 from settings import VERBOSE, N_COLS, LEVEL_BACK
 
+# random number generator used in evolution, see `seed`
+rng = np.random.default_rng()
+
+# max size (in bytes) of the intermediate node values allocated by `eval_population` at a time
+EVAL_BUFFER_BYTES = 64 * 2 ** 20
+
 
 class Function:
     """
     A general function
     """
 
-    def __init__(self, f, arity, name=None):
+    def __init__(self, f, arity, name=None, code=None, vectorized=None):
+        """
+        :param code: optional Python expression template of this function used for compilation, where the
+            arguments are referred to as {0}, {1}, ... If `None`, the compiled code calls *f* directly.
+        :param vectorized: optional element-wise NumPy counterpart of *f* used by `eval_population`.
+            If `None`, *f* itself must accept arrays.
+        """
         self.f = f
         self.arity = arity
         self.name = f.__name__ if name is None else name
+        self.code = code
+        self.vectorized = f if vectorized is None else vectorized
 
     def __call__(self, *args, **kwargs):
         return self.f(*args, **kwargs)
@@ -24,12 +40,9 @@ class Function:
 
 class Node:
     """
-    A node in CGP graph
+    A node in CGP graph. It is only a read-only view of the genes stored in `Individual`, see `Individual.nodes`.
     """
     def __init__(self, max_arity):
-        """
-        Initialize this node randomly
-        """
         self.i_func = None
         self.i_inputs = [None] * max_arity
         self.weights = [None] * max_arity
@@ -40,7 +53,11 @@ class Node:
 
 class Individual:
     """
-    An individual (chromosome, genotype, etc.) in evolution
+    An individual (chromosome, genotype, etc.) in evolution.
+
+    The genome is stored in contiguous arrays: row *pos* of `genes` holds the function gene followed by the
+    connection genes of node *pos*, and row *pos* of `weights` holds the weights of its inputs.
+    A connection gene i < 0 refers to the input -i-1, and i >= 0 refers to node i.
     """
     function_set = None
     weight_range = [-1, 1]
@@ -50,62 +67,159 @@ class Individual:
     n_cols = N_COLS
     level_back = LEVEL_BACK
 
-    def __init__(self):
-        self.nodes = []
-        for pos in range(self.n_cols):
-            self.nodes.append(self._create_random_node(pos))
-        for i in range(1, self.n_outputs + 1):
-            self.nodes[-i].active = True
+    def __init__(self, genes=None, weights=None):
+        """
+        Create an individual from the given genes and weights, or initialize it randomly if they are `None`.
+        """
+        if genes is None:
+            genes = np.empty((self.n_cols, 1 + self.max_arity), dtype=np.int16)
+            genes[:, 0] = rng.integers(0, len(self.function_set), self.n_cols)
+            genes[:, 1:] = self._random_connections(np.repeat(np.arange(self.n_cols), self.max_arity)).reshape(
+                self.n_cols, self.max_arity)
+            weights = rng.uniform(self.weight_range[0], self.weight_range[1], (self.n_cols, self.max_arity))
+        self.genes = genes
+        self.weights = weights
+        self.active = None
         self.fitness = None
         self._active_determined = False
+        self._compiled = None
+        self._phenotype_key = None
 
-    def _create_random_node(self, pos):
-        node = Node(self.max_arity)
-        node.i_func = random.randint(0, len(self.function_set) - 1)
-        for i in range(self.function_set[node.i_func].arity):
-            node.i_inputs[i] = random.randint(max(pos - self.level_back, -self.n_inputs), pos - 1)
-            node.weights[i] = random.uniform(self.weight_range[0], self.weight_range[1])
-        node.i_output = pos
+    @classmethod
+    def _random_connections(cls, positions):
+        """
+        Sample a random connection gene for the node at each position in *positions*.
+        """
+        low = np.maximum(positions - cls.level_back, -cls.n_inputs)
+        return rng.integers(low, positions)
+
+    def to_bytes(self):
+        """
+        Serialize the genome (genes and weights) of this individual compactly. The fitness is not included.
+        """
+        return self.genes.astype('<i2', copy=False).tobytes() + self.weights.astype('<f8', copy=False).tobytes()
 
-        return node
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Create an individual from the genome serialized by `to_bytes`.
+        """
+        n_genes = cls.n_cols * (1 + cls.max_arity)
+        genes = np.frombuffer(data, dtype='<i2', count=n_genes).astype(np.int16).reshape(cls.n_cols, -1)
+        weights = np.frombuffer(data, dtype='<f8', offset=2 * n_genes).astype(float).reshape(cls.n_cols, -1)
+        return cls(genes, weights)
+
+    @property
+    def nodes(self):
+        """
+        A list of `Node` views of the genome, one for each column.
+        """
+        if not self._active_determined:
+            self._determine_active_nodes()
+            self._active_determined = True
+        nodes = []
+        for pos, (row, weights, active) in enumerate(zip(self.genes.tolist(), self.weights.tolist(),
+                                                         self.active.tolist())):
+            node = Node(self.max_arity)
+            node.i_func = row[0]
+            arity = self.function_set[node.i_func].arity
+            node.i_inputs[:arity] = row[1:1 + arity]
+            node.weights[:arity] = weights[:arity]
+            node.i_output = pos
+            node.active = active
+            nodes.append(node)
+        return nodes
 
     def _determine_active_nodes(self):
         """
         Determine which nodes in the CGP graph are active
+        :return the number of active nodes
         """
+        arities = [f.arity for f in self.function_set]
+        active = [False] * self.n_cols
+        active[-self.n_outputs:] = [True] * self.n_outputs
         # check each node in reverse order
         n_active = 0
-        for node in reversed(self.nodes):
-            if node.active:
+        rows = self.genes.tolist()
+        for pos in reversed(range(self.n_cols)):
+            if active[pos]:
                 n_active += 1
-                for i in range(self.function_set[node.i_func].arity):
-                    i_input = node.i_inputs[i]
+                row = rows[pos]
+                for i_input in row[1:1 + arities[row[0]]]:
                     if i_input >= 0:  # a node (not an input)
-                        self.nodes[i_input].active = True
+                        active[i_input] = True
+        self.active = np.array(active)
         if VERBOSE:
             print("# active genes: ", n_active)
+        return n_active
 
-    def eval(self, *args):
+    def _source(self, func_name='f'):
         """
-        Given inputs, evaluate the output of this CGP individual.
-        :return the final output value
+        Generate the source code of a straight-line Python function that computes the output of the active nodes.
+        The weights are baked in as constants, and function *i* without a code template is referred to as `f{i}`.
         """
         if not self._active_determined:
             self._determine_active_nodes()
             self._active_determined = True
-        # forward pass: evaluate
-        for node in self.nodes:
-            if node.active:
-                inputs = []
-                for i in range(self.function_set[node.i_func].arity):
-                    i_input = node.i_inputs[i]
-                    w = node.weights[i]
-                    if i_input < 0:
-                        inputs.append(args[-i_input - 1] * w)
-                    else:
-                        inputs.append(self.nodes[i_input].output * w)
-                node.output = self.function_set[node.i_func](*inputs)
-        return self.nodes[-1].output
+        arg_names = [f'x{i}' for i in range(self.n_inputs)]
+        lines = [f"def {func_name}({', '.join(arg_names)}):"]
+        for pos in np.flatnonzero(self.active).tolist():
+            row = self.genes[pos].tolist()
+            func = self.function_set[row[0]]
+            args = []
+            for i_input, w in zip(row[1:1 + func.arity], self.weights[pos].tolist()):
+                operand = arg_names[-i_input - 1] if i_input < 0 else f'n{i_input}'
+                args.append(f'({operand} * {w!r})')
+            if func.code is None:
+                expr = f"f{row[0]}({', '.join(args)})"
+            else:
+                expr = func.code.format(*args)
+            lines.append(f'    n{pos} = {expr}')
+        lines.append(f'    return n{self.n_cols - 1}')
+        return '\n'.join(lines)
+
+    def compile(self):
+        """
+        Compile the active subgraph of this individual into a straight-line Python function.
+        The result is cached until this individual is mutated.
+        :return a function that accepts the same inputs as `eval`
+        """
+        if self._compiled is None:
+            namespace = {f'f{i}': func.f for i, func in enumerate(self.function_set)}
+            exec(self._source(), namespace)
+            self._compiled = namespace['f']
+        return self._compiled
+
+    def phenotype_key(self):
+        """
+        A canonical hash of the active subgraph (functions, connections and weights) of this individual.
+        Individuals with the same key compute the same function, regardless of their inactive genes.
+        :return a bytes digest
+        """
+        if self._phenotype_key is None:
+            if not self._active_determined:
+                self._determine_active_nodes()
+                self._active_determined = True
+            positions = np.flatnonzero(self.active)
+            # renumber the active nodes consecutively and clear the unused connection genes and weights
+            rank = np.cumsum(self.active) - 1
+            genes = self.genes[positions].astype(np.int64)
+            connections = genes[:, 1:]
+            connections[connections >= 0] = rank[connections[connections >= 0]]
+            weights = self.weights[positions].copy()
+            arities = np.array([f.arity for f in self.function_set])[genes[:, 0]]
+            unused = np.arange(self.max_arity) >= arities[:, None]
+            connections[unused] = 0
+            weights[unused] = 0
+            self._phenotype_key = hashlib.blake2b(genes.tobytes() + weights.tobytes(), digest_size=16).digest()
+        return self._phenotype_key
+
+    def eval(self, *args):
+        """
+        Given inputs, evaluate the output of this CGP individual.
+        :return the final output value
+        """
+        return self.compile()(*args)
 
     def mutate(self, mut_rate=0.01):
         """
@@ -113,25 +227,21 @@ class Individual:
         :param mut_rate: mutation probability
         :return a child after mutation
         """
-        child = copy.deepcopy(self)
-        for pos, node in enumerate(child.nodes):
-            # mutate the function gene
-            if random.random() < mut_rate:
-                node.i_func = random.choice(range(len(self.function_set)))
-            # mutate the input genes (connection genes)
-            arity = self.function_set[node.i_func].arity
-            for i in range(arity):
-                if node.i_inputs[i] is None or random.random() < mut_rate:  # if the mutated function requires more arguments, then the last ones are None 
-                    node.i_inputs[i] = random.randint(max(pos - self.level_back, -self.n_inputs), pos - 1)
-                if node.weights[i] is None or random.random() < mut_rate:
-                    node.weights[i] = random.uniform(self.weight_range[0], self.weight_range[1])
-            # initially an individual is not active except hte last output node
-            node.active = False
-        for i in range(1, self.n_outputs + 1):
-            child.nodes[-i].active = True
-        child.fitness = None
-        child._active_determined = False
-        return child
+        genes = self.genes.copy()
+        weights = self.weights.copy()
+        # one coin flip for each gene: the function gene, the connection genes and the weights of each node
+        flips = rng.random((self.n_cols, 1 + 2 * self.max_arity)) < mut_rate
+        n_funcs = np.count_nonzero(flips[:, 0])
+        if n_funcs:
+            genes[flips[:, 0], 0] = rng.integers(0, len(self.function_set), n_funcs)
+        positions = np.nonzero(flips[:, 1:1 + self.max_arity])
+        if len(positions[0]):
+            genes[:, 1:][positions] = self._random_connections(positions[0])
+        n_weights = np.count_nonzero(flips[:, 1 + self.max_arity:])
+        if n_weights:
+            weights[flips[:, 1 + self.max_arity:]] = rng.uniform(self.weight_range[0], self.weight_range[1],
+                                                                   n_weights)
+        return type(self)(genes, weights)
 
 
 # function set
@@ -141,11 +251,64 @@ def protected_div(a, b):
     return a / b
 
 
-fs = [Function(op.add, 2), Function(op.sub, 2), Function(op.mul, 2), Function(protected_div, 2), Function(op.neg, 1)]
+def protected_div_vectorized(a, b):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(np.abs(b) < 1e-6, a, a / b)
+
+
+fs = [Function(op.add, 2, code='{0} + {1}'), Function(op.sub, 2, code='{0} - {1}'),
+      Function(op.mul, 2, code='{0} * {1}'), Function(protected_div, 2, vectorized=protected_div_vectorized),
+      Function(op.neg, 1, code='-{0}')]
 Individual.function_set = fs
 Individual.max_arity = max(f.arity for f in fs)
 
 
+class FitnessCache:
+    """
+    A LRU cache of fitness values keyed by the phenotype of individuals (see `Individual.phenotype_key`).
+    It is only valid if the fitness evaluation is deterministic, e.g., all birds fly on the same track.
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._fitness = OrderedDict()
+
+    def get(self, ind, context=None):
+        """
+        Get the cached fitness of individual *ind* evaluated in the given *context* (e.g., the track).
+        :return the fitness value, or None if it is not in the cache
+        """
+        key = (context, ind.phenotype_key())
+        fitness = self._fitness.get(key)
+        if fitness is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._fitness.move_to_end(key)
+        return fitness
+
+    def put(self, ind, fitness, context=None):
+        """
+        Cache the *fitness* of individual *ind* evaluated in the given *context*.
+        The least recently used entry is evicted if the cache is full.
+        """
+        key = (context, ind.phenotype_key())
+        self._fitness[key] = fitness
+        self._fitness.move_to_end(key)
+        if len(self._fitness) > self.max_size:
+            self._fitness.popitem(last=False)
+
+    def clear(self):
+        self._fitness.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._fitness)
+
+
 def evolve(pop, mut_rate, mu, lambda_):
     """
     Evolve the population *pop* using the mu + lambda evolutionary strategy
@@ -158,14 +321,136 @@ def evolve(pop, mut_rate, mu, lambda_):
     parents = pop[-mu:]
     # generate lambda new children via mutation
     offspring = []
-    for _ in range(lambda_):
-        parent = random.choice(parents)
-        offspring.append(parent.mutate(mut_rate))
+    for i_parent in rng.integers(0, mu, lambda_).tolist():
+        offspring.append(parents[i_parent].mutate(mut_rate))
     return parents + offspring
 
 
+class SteadyState:
+    """
+    Steady-state evolution: instead of replacing a whole population at once in `evolve`, each individual is inserted
+    into a pool of *mu* parents as soon as it has been evaluated, and a child of the pool takes its place.
+    """
+    REPLACEMENTS = ('mu+lambda', 'tournament')
+
+    def __init__(self, mu, replacement='mu+lambda', tournament_size=2):
+        """
+        :param replacement: 'mu+lambda': a new individual replaces the worst parent if it is not worse, such that the
+            pool keeps the mu best individuals, and children are mutated from random parents like in `evolve`.
+            'tournament': a new individual replaces the worst of *tournament_size* random parents if it is not worse,
+            and children are mutated from the best of *tournament_size* random parents.
+        """
+        if replacement not in self.REPLACEMENTS:
+            raise ValueError(f'Unknown replacement {replacement!r}, expected one of {self.REPLACEMENTS}')
+        self.mu = mu
+        self.replacement = replacement
+        self.tournament_size = tournament_size
+        self.parents = []
+
+    def _tournament(self):
+        k = min(self.tournament_size, len(self.parents))
+        return rng.choice(len(self.parents), k, replace=False).tolist()
+
+    def insert(self, ind):
+        """
+        Insert an evaluated individual into the pool of parents. Like in `evolve`, a new individual wins ties.
+        :return: whether it has entered the pool
+        """
+        if len(self.parents) < self.mu:
+            self.parents.append(ind)
+            return True
+        candidates = range(len(self.parents)) if self.replacement == 'mu+lambda' else self._tournament()
+        i_worst = min(candidates, key=lambda i: self.parents[i].fitness)
+        if ind.fitness >= self.parents[i_worst].fitness:
+            self.parents[i_worst] = ind
+            return True
+        return False
+
+    def child(self, mut_rate):
+        """
+        Create a child by mutating a parent. At least one individual must have been inserted.
+        """
+        if self.replacement == 'mu+lambda':
+            parent = self.parents[rng.integers(0, len(self.parents))]
+        else:
+            parent = max((self.parents[i] for i in self._tournament()), key=lambda ind: ind.fitness)
+        return parent.mutate(mut_rate)
+
+
+def seed(value):
+    """
+    Seed the random number generator used in evolution for reproduction.
+    """
+    global rng
+    rng = np.random.default_rng(value)
+
+
 def create_population(n):
     """
     Create a random population composed of n individuals.
     """
     return [Individual() for _ in range(n)]
+
+
+def _stack_genomes(pop):
+    """
+    Stack the genes of individuals in *pop* into arrays for vectorized evaluation.
+    :return: (functions, connections, weights, active), where connections are indices into the node values in
+        `eval_population`, i.e., the inputs come first followed by the nodes.
+    """
+    n_inputs = Individual.n_inputs
+    n_cols = Individual.n_cols
+    max_arity = Individual.max_arity
+    for ind in pop:
+        if not ind._active_determined:
+            ind._determine_active_nodes()
+            ind._active_determined = True
+    functions = np.array([ind.genes[:, 0] for ind in pop], dtype=np.intp).reshape(len(pop), n_cols)
+    connections = np.array([ind.genes[:, 1:] for ind in pop], dtype=np.intp).reshape(len(pop), n_cols, max_arity)
+    connections = np.where(connections < 0, -connections - 1, n_inputs + connections)
+    weights = np.array([ind.weights for ind in pop]).reshape(len(pop), n_cols, max_arity)
+    active = np.array([ind.active for ind in pop], dtype=bool).reshape(len(pop), n_cols)
+    return functions, connections, weights, active
+
+
+def eval_population(pop, inputs):
+    """
+    Evaluate all the individuals in *pop* on many inputs in one vectorized pass.
+    The nodes are processed column by column for all individuals at once, such that the Python-level cost only
+    depends on the number of columns and functions, not on the population size or the number of inputs.
+
+    :param pop: a list of K individuals
+    :param inputs: an array of shape (N, n_inputs) shared by all individuals, e.g., N rows of (v, h, g),
+        or of shape (K, N, n_inputs) to give each individual its own N input rows
+    :return: a K x N array, whose entry (k, j) is the output of individual k on its j-th input row
+    """
+    inputs = np.asarray(inputs, dtype=float)
+    if inputs.ndim == 2:
+        inputs = np.broadcast_to(inputs, (len(pop),) + inputs.shape)
+    n_pop, n_rows, n_inputs = inputs.shape
+    functions, connections, weights, active = _stack_genomes(pop)
+    n_values = n_inputs + Individual.n_cols
+    output = np.empty((n_pop, n_rows))
+    if n_pop == 0 or n_rows == 0:
+        return output
+    # evaluate the input rows in chunks to bound the memory of the intermediate node values
+    chunk = max(1, EVAL_BUFFER_BYTES // (n_values * n_pop * 8))
+    individuals = np.arange(n_pop)
+    for start in range(0, n_rows, chunk):
+        stop = min(start + chunk, n_rows)
+        values = np.zeros((n_values, n_pop, stop - start))
+        values[:n_inputs] = np.moveaxis(inputs[:, start:stop, :], 2, 0)
+        with np.errstate(all='ignore'):
+            for pos in range(Individual.n_cols):
+                is_active = active[:, pos]
+                if not is_active.any():
+                    continue
+                args = [values[connections[:, pos, i], individuals] * weights[:, pos, i, None]
+                        for i in range(Individual.max_arity)]
+                result = values[n_inputs + pos]
+                for i_func, func in enumerate(Individual.function_set):
+                    mask = is_active & (functions[:, pos] == i_func)
+                    if mask.any():
+                        result[mask] = func.vectorized(*(arg[mask] for arg in args[:func.arity]))
+        output[:, start:stop] = values[-1]
+    return output
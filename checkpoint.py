@@ -0,0 +1,228 @@
+"""
+Checkpoints of evolution.
+
+A checkpoint holds everything needed to continue a run exactly as if it had never stopped: the genomes and fitness
+values of the population, the generation counter, the max scores, the states of both random number generators
+(the `random` module for the game and `cgp.rng` for evolution) and the length of the last spawned pipe, on which the
+first pipe of the next round depends. In steady-state evolution (see STEADY_STATE), the birds keep flying across
+generations, so the pool of parents, the mutation rate of the children and the state of the world (the birds and the
+pipes) are saved as well. It is stored in a small versioned binary file:
+
+    header | random state | cgp.rng state | fitness values | genomes | [steady state] | CRC32 of all the previous bytes
+
+where the steady-state section is made of the fitness values and genomes of the parents followed by the world.
+
+The file is first written to a temporary file and then renamed, such that a crash during writing never corrupts the
+previous checkpoint.
+"""
+import os
+import random
+import struct
+import time
+import zlib
+
+import numpy as np
+
+import cgp
+from course import PIPE_WIDTH, get_course
+from settings import *
+from world import SimPipe
+
+MAGIC = b'GPFB'
+VERSION = 2
+# magic, version, generation, max score so far, max score of the last generation, length of the last spawned pipe
+# (-1 if none), population size, bytes per genome
+_HEADER = struct.Struct('<4sHIqqiII')
+# since version 2: whether the steady-state section follows, mutation rate of the children, number of parents
+_STEADY_STATE = struct.Struct('<?dI')
+# state of the world in steady-state evolution: max score and number of CGP evaluations in this round, distance
+# scrolled by the pipes, index of the next pair of pipes on the course, number of birds in the round, number of alive
+# birds, number of pairs of pipes
+_WORLD = struct.Struct('<qqqIIII')
+# Mersenne Twister state (624 words and the position) of `random` and its cached Gaussian value (NaN if none)
+_RANDOM_STATE = struct.Struct('<625Id')
+# PCG64 state and increment (128-bit each), has_uint32 and uinteger of `cgp.rng`
+_RNG_STATE = struct.Struct('<16s16sII')
+_CRC = struct.Struct('<I')
+
+
+class CheckpointError(Exception):
+    pass
+
+
+def _pack_rng_state(bit_generator):
+    state = bit_generator.state
+    if state['bit_generator'] != 'PCG64':
+        raise CheckpointError(f"Unsupported bit generator: {state['bit_generator']}")
+    return _RNG_STATE.pack(state['state']['state'].to_bytes(16, 'little'),
+                           state['state']['inc'].to_bytes(16, 'little'), state['has_uint32'], state['uinteger'])
+
+
+def _unpack_rng_state(data):
+    s, inc, has_uint32, uinteger = _RNG_STATE.unpack(data)
+    return {'bit_generator': 'PCG64',
+            'state': {'state': int.from_bytes(s, 'little'), 'inc': int.from_bytes(inc, 'little')},
+            'has_uint32': has_uint32, 'uinteger': uinteger}
+
+
+def _fitness_values(pop):
+    return np.array([np.nan if ind.fitness is None else ind.fitness for ind in pop], dtype='<f8')
+
+
+def _restore_individuals(data, offset, n, genome_size):
+    """
+    Restore *n* individuals from their fitness values followed by their genomes at *offset* in *data*.
+    :return: (individuals, offset after them)
+    """
+    fitness = np.frombuffer(data, dtype='<f8', count=n, offset=offset).tolist()
+    offset += 8 * n
+    pop = []
+    for i in range(n):
+        ind = cgp.Individual.from_bytes(data[offset:offset + genome_size])
+        if not np.isnan(fitness[i]):
+            # scores are saved as floats but are integers in most cases
+            ind.fitness = int(fitness[i]) if fitness[i].is_integer() else fitness[i]
+        pop.append(ind)
+        offset += genome_size
+    return pop, offset
+
+
+def _dumps_world(world, n_birds):
+    """
+    Serialize the birds and pipes of *world*, where the birds with an id not less than *n_birds* (the human player)
+    are left out.
+    """
+    kept = world.ids < n_birds
+    pipes = [(bottom.x, top.length, bottom.length, bottom.gap) for _, bottom, top in world._bottom_pipes]
+    return b''.join([
+        _WORLD.pack(world.max_score, world.n_evals, world._scroll, world._course_index, n_birds,
+                    np.count_nonzero(kept), len(pipes)),
+        world.alive[:n_birds].astype('<u1').tobytes(), world.score[:n_birds].astype('<i8').tobytes(),
+        world.gap_distance[:n_birds].astype('<f8').tobytes(),
+        *(a[kept].astype('<i8').tobytes() for a in (world.ids, world.x, world.y, world.w, world.h)),
+        world.vel_y[kept].astype('<f8').tobytes(),
+        np.array(pipes, dtype='<i8').reshape(-1, 4).tobytes()])
+
+
+def _loads_world(data, offset, world, brains):
+    """
+    Restore the birds and pipes serialized by `_dumps_world` at *offset* in *data* into *world*.
+    :return: the offset after them
+    """
+    max_score, n_evals, scroll, course_index, n_birds, n_alive, n_pipes = _WORLD.unpack_from(data, offset)
+    offset += _WORLD.size
+
+    def _array(dtype, count):
+        nonlocal offset
+        a = np.frombuffer(data, dtype=dtype, count=count, offset=offset).copy()
+        offset += a.nbytes
+        return a
+
+    world.course = get_course(COURSE) if COURSE is not None else None
+    world.brains = list(brains)
+    world.alive = _array('<u1', n_birds).astype(bool)
+    world.score = _array('<i8', n_birds)
+    world.gap_distance = _array('<f8', n_birds)
+    world.start_time = np.full(n_birds, time.perf_counter())  # the wall time budget starts again
+    world.ids = _array('<i8', n_alive).astype(np.intp)
+    world.x, world.y, world.w, world.h = (_array('<i8', n_alive) for _ in range(4))
+    world.vel_y = _array('<f8', n_alive)
+    world.max_score, world.n_evals, world._scroll, world._course_index = max_score, n_evals, scroll, course_index
+    world.pipes = []
+    world._bottom_pipes.clear()
+    for x, top_length, bottom_length, gap in _array('<i8', 4 * n_pipes).reshape(-1, 4).tolist():
+        top_pipe = SimPipe(x + PIPE_WIDTH // 2, top_length, True, gap)
+        bottom_pipe = SimPipe(x + PIPE_WIDTH // 2, bottom_length, False, gap)
+        world.pipes.extend([top_pipe, bottom_pipe])
+        world._bottom_pipes.append((bottom_pipe.right + scroll, bottom_pipe, top_pipe))
+    world._front_pipe = world.pipes[-2] if world.pipes else None
+    world._update_columns()
+    world._update_evaluated()
+    return offset
+
+
+def dumps(game):
+    """
+    Serialize the state of evolution of *game* (a `game.Game` or `world.HeadlessGame`) and of the random number
+    generators into bytes.
+    """
+    genomes = [ind.to_bytes() for ind in game.pop]
+    _, mt, gauss_next = random.getstate()
+    front_pipe = game._world._front_pipe
+    steady_state = game.steady_state
+    parts = [_HEADER.pack(MAGIC, VERSION, game.current_generation, game._max_score_so_far, game._max_score,
+                          front_pipe.length if front_pipe is not None else -1, len(genomes), len(genomes[0])),
+             _STEADY_STATE.pack(steady_state is not None, game._mut_rate,
+                                len(steady_state.parents) if steady_state is not None else 0),
+             _RANDOM_STATE.pack(*mt, np.nan if gauss_next is None else gauss_next),
+             _pack_rng_state(cgp.rng.bit_generator),
+             _fitness_values(game.pop).tobytes()]
+    parts.extend(genomes)
+    if steady_state is not None:
+        parts.append(_fitness_values(steady_state.parents).tobytes())
+        parts.extend(ind.to_bytes() for ind in steady_state.parents)
+        parts.append(_dumps_world(game._world, len(game.pop)))
+    data = b''.join(parts)
+    return data + _CRC.pack(zlib.crc32(data))
+
+
+def loads(data, game):
+    """
+    Restore the state of evolution serialized by `dumps` into *game* and the random number generators.
+    """
+    if len(data) < _HEADER.size + _CRC.size or zlib.crc32(data[:-_CRC.size]) != _CRC.unpack(data[-_CRC.size:])[0]:
+        raise CheckpointError('The checkpoint is truncated or corrupted')
+    magic, version, generation, max_score_so_far, max_score, front_length, n, genome_size = _HEADER.unpack_from(data)
+    if magic != MAGIC or version not in (1, VERSION):
+        raise CheckpointError(f'Not a checkpoint of version 1 to {VERSION}')
+    ind_cls = cgp.Individual
+    if genome_size != ind_cls.n_cols * (2 * (1 + ind_cls.max_arity) + 8 * ind_cls.max_arity):
+        raise CheckpointError('The genomes in the checkpoint do not match the current CGP settings')
+    offset = _HEADER.size
+    is_steady, mut_rate, n_parents = False, None, 0
+    if version >= 2:
+        is_steady, mut_rate, n_parents = _STEADY_STATE.unpack_from(data, offset)
+        offset += _STEADY_STATE.size
+    if is_steady != (game.steady_state is not None):
+        raise CheckpointError('The checkpoint does not match the current STEADY_STATE setting')
+    *mt, gauss_next = _RANDOM_STATE.unpack_from(data, offset)
+    offset += _RANDOM_STATE.size
+    rng_state = _unpack_rng_state(data[offset:offset + _RNG_STATE.size])
+    offset += _RNG_STATE.size
+    pop, offset = _restore_individuals(data, offset, n, genome_size)
+    if is_steady:
+        game.steady_state.parents, offset = _restore_individuals(data, offset, n_parents, genome_size)
+        game._mut_rate = mut_rate
+        offset = _loads_world(data, offset, game._world, pop)
+        if hasattr(game, '_human_id'):
+            game._human_id = None
+
+    game.pop = pop
+    game.current_generation = generation
+    game._max_score_so_far = max_score_so_far
+    game._max_score = max_score
+    if not is_steady:
+        # only the length of the front pipe is used when the first pipe of the next round is spawned
+        game._world._front_pipe = SimPipe(0, front_length, True, 0) if front_length >= 0 else None
+    random.setstate((3, tuple(mt), None if np.isnan(gauss_next) else gauss_next))
+    cgp.rng.bit_generator.state = rng_state
+
+
+def save_checkpoint(game, file=CHECKPOINT_FILE):
+    """
+    Save a checkpoint of *game* into *file* atomically.
+    """
+    tmp_file = file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(dumps(game))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, file)
+
+
+def load_checkpoint(game, file=CHECKPOINT_FILE):
+    """
+    Restore *game* and the random number generators from the checkpoint in *file*.
+    """
+    with open(file, 'rb') as f:
+        loads(f.read(), game)
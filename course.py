@@ -0,0 +1,159 @@
+"""
+Pipe courses.
+
+A course is a whole track generated from a seed and stored compactly as an int32 array, one row (centerx,
+top length, gap) for each pair of pipes. Courses can be saved to and memory-mapped from `.npy` files, such that the
+headless evaluators, the parallel workers and the visual game all fly on exactly the same pipes.
+"""
+import functools
+import os.path
+import random
+import struct
+
+import numpy as np
+
+from settings import *
+
+
+def image_size(file_name):
+    """
+    Read the (width, height) of a PNG image in IMG_DIR from its header without decoding it.
+    """
+    with open(os.path.join(IMG_DIR, file_name), 'rb') as f:
+        header = f.read(24)
+    return struct.unpack('>II', header[16:24])
+
+
+PIPE_WIDTH = image_size('pipetop.png')[0]
+
+
+def next_pipe(rng, front_x, front_length, min_pipe_space=MIN_PIPE_SPACE, min_pipe_gap=MIN_PIPE_GAP):
+    """
+    Generate the geometry of a new pair of pipes in the front.
+
+    :param rng: a random number generator, e.g., the `random` module or a `random.Random` instance
+    :param front_x: the x coordinate of the currently most front pipe
+    :param front_length: length of the currently most front (top) pipe. `None` if there is no pipe yet.
+    :return: (centerx, gap, top_length, bottom_length) of the new pair of pipes
+    """
+    pipe_space = rng.randint(min_pipe_space, MAX_PIPE_SPACE)
+    centerx = front_x + pipe_space
+    d_gap = MAX_PIPE_GAP - min_pipe_gap
+    d_space = MAX_PIPE_SPACE - min_pipe_space
+    if pipe_space > (min_pipe_space + MAX_PIPE_SPACE) / 2:
+        gap = rng.randint(min_pipe_gap, MAX_PIPE_GAP)
+    else:
+        gap = rng.randint(int(MAX_PIPE_GAP - d_gap * (pipe_space - min_pipe_space) / d_space),
+                          MAX_PIPE_GAP) + 8
+    # if pipe space is too small, then the top_length should be similar to the previous one
+    if pipe_space - min_pipe_gap < d_space // 3:
+        top_length = front_length + rng.randint(-50, 50)
+    else:
+        top_length = rng.randint(MIN_PIPE_LENGTH, SCREEN_HEIGHT - gap - MIN_PIPE_LENGTH)
+    if front_length is not None:
+        gap += abs(top_length - front_length) // 10
+    bottom_length = SCREEN_HEIGHT - gap - top_length
+    return centerx, gap, top_length, bottom_length
+
+
+class GeneratedCourse:
+    """
+    A course generated from a seed like `generate_course`, but lazily: each pair of pipes is only generated once it is
+    accessed, such that a round in which the birds only fly through a few pipes does not pay for the whole course.
+    It supports the access of `pipe_at`: ``len(course)``, ``course[i]`` and ``course[i, j]`` for ``0 <= i < len``.
+    """
+
+    def __init__(self, seed, n_pipes=COURSE_LENGTH):
+        if n_pipes < 2:
+            raise ValueError(f'A course needs at least 2 pairs of pipes, got {n_pipes}')
+        self._rng = random.Random(seed)
+        self._rows = np.empty((n_pipes, 3), dtype=np.int32)
+        self._n_generated = 0
+        self._front = 80, None  # (x, length) of the most front pipe so far, the first pipe with x = 80 as the baseline
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, key):
+        i = key[0] if isinstance(key, tuple) else key
+        if i >= self._n_generated:
+            self._generate(i + 1)
+        return self._rows[key]
+
+    def _generate(self, n):
+        """
+        Generate the pairs of pipes up to the *n*-th one.
+        """
+        front_x, front_length = self._front
+        for i in range(self._n_generated, n):
+            centerx, gap, top_length, _ = next_pipe(self._rng, front_x, front_length)
+            self._rows[i] = centerx, top_length, gap
+            front_x, front_length = centerx - PIPE_WIDTH // 2, top_length
+        self._front = front_x, front_length
+        self._n_generated = max(self._n_generated, n)
+
+    def to_array(self):
+        """
+        Generate the rest of the course.
+        :return: the whole course as an int32 array of shape (n_pipes, 3)
+        """
+        self._generate(len(self._rows))
+        return self._rows
+
+
+def generate_course(seed, n_pipes=COURSE_LENGTH):
+    """
+    Precompute a course of *n_pipes* pairs of pipes from *seed* with the same rules as the game.
+    :return: an int32 array of shape (n_pipes, 3), whose rows are (centerx, top_length, gap)
+    """
+    return GeneratedCourse(seed, n_pipes).to_array()
+
+
+def save_course(course, file):
+    np.save(file, course)
+
+
+def load_course(file):
+    """
+    Load a course saved by `save_course`. The file is memory-mapped instead of being read into memory.
+    Since the spacing of the pipes is derived from adjacent rows, a course needs at least 2 pairs of pipes.
+    """
+    course = np.load(file, mmap_mode='r')
+    if course.ndim != 2 or course.shape[1] != 3 or len(course) < 2:
+        raise ValueError(f'A course must be an array of shape (n, 3) with n >= 2, got shape {course.shape} '
+                         f'from {file}')
+    return course
+
+
+@functools.lru_cache(maxsize=8)
+def get_course(spec):
+    """
+    Get a course from its specification, which is either a seed (int) or the path to a `.npy` file (str).
+    Each course is only loaded once per process, and the pipes of a generated course are only generated once they are
+    reached (see `GeneratedCourse`).
+    """
+    if isinstance(spec, str):
+        return load_course(spec)
+    return GeneratedCourse(spec)
+
+
+def pipe_at(course, index, front_x):
+    """
+    Get the *index*-th pair of pipes of *course* placed in front of the currently most front pipe at *front_x*.
+    The course is repeated if the birds have flown through all its pipes.
+
+    :return: (centerx, gap, top_length, bottom_length) of the pair of pipes like `next_pipe`
+    """
+    i = index % len(course)
+    centerx, top_length, gap = course[i].tolist()
+    if index > 0:
+        space = centerx - int(course[i - 1, 0]) if i > 0 else int(course[1, 0] - course[0, 0])
+        centerx = front_x + PIPE_WIDTH // 2 + space
+    return centerx, gap, top_length, SCREEN_HEIGHT - gap - top_length
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) != 3:
+        sys.exit('Usage: python course.py <seed> <file.npy>')
+    save_course(generate_course(int(sys.argv[1])), sys.argv[2])
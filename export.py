@@ -0,0 +1,147 @@
+"""
+Export of evolved controllers.
+
+An evolved individual (or its computational graph extracted by `postprocessing.extract_computational_subgraph`) is
+translated into a standalone Python module, which only depends on NumPy and evaluates a whole batch of (v, h, g)
+states in one call with straight-line array expressions. The module can be deployed without this project, e.g.,
+to control a bird in another implementation of the game.
+"""
+import importlib.util
+import inspect
+import os.path
+
+import numpy as np
+
+import cgp
+from settings import *
+
+INPUT_NAMES = ('v', 'h', 'g')
+
+_MODULE_TEMPLATE = '''"""
+Flappy bird controller evolved by Cartesian genetic programming{score}.
+
+This file is generated by export.py and only depends on NumPy.
+"""
+import numpy as np
+
+INPUTS = {input_names!r}
+
+
+{helpers}def {func_name}({args}):
+    """
+    Evaluate the controller on scalars or on arrays of the same shape, one element for each state.
+    The bird should flap if the output is positive.
+    """
+{body}
+
+
+def flap(states):
+    """
+    Decide whether to flap in a batch of states.
+
+    :param states: an array of shape (N, {n_inputs}), whose rows are ({args})
+    :return: a boolean array of shape (N,)
+    """
+    states = np.asarray(states, dtype=float)
+    return {func_name}({columns}) > 0
+'''
+
+
+def _steps(controller):
+    """
+    The active nodes of *controller* (a `cgp.Individual` or a computational graph) in topological order.
+    :return: a list of (node id, function, [(operand, weight)]), where an operand is an input index (< 0 as in CGP)
+        or a node id
+    """
+    function_set = cgp.Individual.function_set
+    if isinstance(controller, cgp.Individual):
+        steps = []
+        for node in controller.nodes:
+            if node.active:
+                func = function_set[node.i_func]
+                inputs = list(zip(node.i_inputs[:func.arity], node.weights[:func.arity]))
+                steps.append((node.i_output, func, inputs))
+        return steps
+    functions = {func.name: func for func in function_set}
+    steps = []
+    # the nodes of a CGP graph only depend on the nodes before them, and the inputs are numbered negatively
+    for node_id in sorted(n for n in controller.nodes if n >= 0):
+        edges = sorted(controller.in_edges(node_id, data=True), key=lambda e: e[2]['order'])
+        steps.append((node_id, functions[controller.nodes[node_id]['func']],
+                      [(i_input, attr['weight']) for i_input, _, attr in edges]))
+    return steps
+
+
+def export_source(controller, func_name='controller', input_names=INPUT_NAMES, score=None):
+    """
+    Generate the source code of a standalone NumPy module that evaluates *controller*.
+
+    :param controller: a `cgp.Individual` or its computational graph
+    :param func_name: name of the function taking the inputs as arguments in the module
+    :param score: the score of the controller mentioned in the docstring of the module, if any
+    :return: the source code (str)
+    """
+    helpers = {}  # source code of the vectorized functions without a code template, by name
+    body = []
+    for node_id, func, inputs in _steps(controller):
+        args = []
+        for i_input, w in inputs:
+            operand = input_names[-i_input - 1] if i_input < 0 else f'n{i_input}'
+            args.append(f'({operand} * {float(w)!r})')
+        if func.code is None:
+            helpers[func.vectorized.__name__] = inspect.getsource(func.vectorized)
+            expr = f"{func.vectorized.__name__}({', '.join(args)})"
+        else:
+            expr = func.code.format(*args)
+        body.append(f'    n{node_id} = {expr}')
+    body.append(f'    return n{node_id}')
+    if helpers:  # the vectorized functions may compute values discarded afterwards, e.g., a division by zero
+        body.insert(0, "    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):")
+        body[1:] = ['    ' + line for line in body[1:]]
+    return _MODULE_TEMPLATE.format(
+        score='' if score is None else f' (score: {score})', input_names=tuple(input_names),
+        helpers=''.join(source.rstrip() + '\n\n\n' for source in helpers.values()), func_name=func_name,
+        args=', '.join(input_names), body='\n'.join(body), n_inputs=len(input_names),
+        columns=', '.join(f'states[:, {i}]' for i in range(len(input_names))))
+
+
+def export_controller(controller, file, score=None):
+    """
+    Write the standalone module of *controller* into *file*. See `export_source`.
+    """
+    with open(file, 'w') as f:
+        f.write(export_source(controller, score=score))
+
+
+def load_controller(file):
+    """
+    Import an exported module from *file*.
+    :return: the module, whose `controller` function evaluates the controller and `flap` decides on a batch of states
+    """
+    name = os.path.splitext(os.path.basename(file))[0]
+    spec = importlib.util.spec_from_file_location(name, file)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def random_states(n, seed=0):
+    """
+    Random (v, h, g) states covering the ranges seen in the game.
+    :return: an array of shape (n, 3)
+    """
+    rng = np.random.default_rng(seed)
+    return np.column_stack([rng.uniform(-SCREEN_HEIGHT, SCREEN_HEIGHT, n),
+                            rng.uniform(-50, MAX_PIPE_SPACE + SCREEN_WIDTH, n),
+                            rng.uniform(MIN_PIPE_GAP, MAX_PIPE_GAP + 30, n)])
+
+
+def check_controller(ind, module, n=10000, seed=0):
+    """
+    Check that an exported *module* computes the same outputs as the individual *ind* on *n* random states.
+    :return: True if all the outputs are equal (or both NaN)
+    """
+    states = random_states(n, seed)
+    expected = np.array([ind.eval(*state) for state in states.tolist()])
+    actual = module.controller(*states.T)
+    return bool(np.array_equal(expected, actual, equal_nan=True))
@@ -1,14 +1,20 @@
 """
 The main flappy bird game.
 """
-import random
 from enum import Enum
 
 import os.path
 import os
 
-import cgp
+import numpy as np
+
+from hud import HUD, TextLine
+from sounds import SoundBank
+from scenes import AbstractScene, SceneManager
 from sprites import *
+from course import get_course
+from recording import Recorder
+from world import Evolution, World, refill_slots
 
 
 class GameMode(Enum):
@@ -17,65 +23,83 @@ class GameMode(Enum):
     VS = 2  # human player vs. GP
 
 
-class Game:
-    def __init__(self):
+class Game(AbstractScene, Evolution):
+    """
+    The game scene. Each simulation step (frame of the game physics) of the world (see `world.World`) is performed by
+    `update`, and the scene manager decides how many steps are simulated per rendered frame, which does not change the
+    results of the simulation. The sprites only draw the state of the world in `draw`: all the pipes and at most
+    MAX_RENDERED_BIRDS of the alive birds.
+    """
+    def __init__(self, manager=None, turbo=False):
+        """
+        :param manager: the scene manager running the game, a new one by default
+        :param turbo: whether to start in turbo mode (see `_set_speed`), e.g., to train or test without waiting
+        """
         os.environ['SDL_VIDEO_WINDOW_POS'] = '200,300'
         pg.mixer.pre_init()
         pg.mixer.init()
-        pg.init()
-        self._screen = pg.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pg.display.set_caption(TITLE)
-        self._clock = pg.time.Clock()
+        super().__init__(manager or SceneManager())
+        self._screen = self.manager.screen
         self._is_paused = False
-        self._fps = FPS
+        self._speed = 1  # number of simulation steps per rendered frame if not in turbo mode
+        self._turbo = False  # if True, the game runs uncapped and is rendered at TURBO_FPS only
+        # if True, the rest of the round is simulated without drawing, see `_check_fast_forward`
+        self._fast_forward = False
         self.music_on = False
+        self.sounds = SoundBank()
+        self._hud = HUD()
 
         self._bird_image = None
         self._pipe_images = None
         self._background_image = None
+        self._bird_rotations = None
+        self._blue_bird_rotations = None
 
-        self.all_sprites = pg.sprite.LayeredUpdates()
-        self.birds = pg.sprite.Group()
-        self.pipes = pg.sprite.Group()
+        self.all_sprites = pg.sprite.LayeredDirty()  # only the changed regions of the screen are updated
         self._load_images()
-        self._human_bird = None
+        # the birds drawn in a frame are shown by the first views, and the others are removed from the sprites
+        self._bird_views = [BirdView(self._bird_rotations) for _ in range(MAX_RENDERED_BIRDS)]
+        self._human_view = BirdView(self._blue_bird_rotations, layer=3)  # in front of the AI birds
+        self._pipe_views = {}  # world.SimPipe -> Pipe
+        self._human_id = None  # id of the human player's bird in the world
 
-        self.running = True
         self.playing = False
-        self._front_pipe = None  # the pipe in the most front
-        self._min_pipe_space = MIN_PIPE_SPACE
-        self._min_pipe_gap = MIN_PIPE_GAP
+        self._course = get_course(COURSE) if COURSE is not None else None
+        # with a frame budget, the birds that exceed the wall time budget are fast-forwarded instead of retired
+        self._world = World(course=self._course,
+                            max_seconds=MAX_EVAL_SECONDS if MAX_EVAL_FRAMES is None else None)
+        self._recorder = Recorder(RECORD_DIR) if RECORD_DIR is not None else None
 
-        # CGP settings
-        self.n_birds = MU + LAMBDA
-        self._max_score_so_far = 0  # max score so far in all the rounds since the game started
-        self._max_score = 0  # max score of all the birds in this round (generation)
-        self.current_generation = 0
+        # CGP settings and the initial population
+        self._init_evolution()
+        self._n_evaluated = 0  # number of birds that have died in this generation in steady-state evolution
+        self._set_speed(turbo=turbo)
 
-        # create the initial population
-        self.pop = cgp.create_population(self.n_birds)
+    @property
+    def running(self):
+        """
+        False once the game window is closed.
+        """
+        return self.manager.running
 
     def reset(self):
-        if VERBOSE:
-            print(f'--------Generation: {self.current_generation}. Max score so far: {self._max_score_so_far}-------')
-        self._max_score = 0
-        self.current_generation += 1
-        self._min_pipe_space = MIN_PIPE_SPACE
-        self._min_pipe_gap = MIN_PIPE_GAP
+        self._begin_generation()
+        self.n_evals = 0
+        self._n_evaluated = 0
+        self._fast_forward = False
         # empty all the current sprites if any
         for s in self.all_sprites:
             s.kill()
-        # instantiate birds
-        for i in range(self.n_birds):
-            x = random.randint(20, 200)
-            y = random.randint(SCREEN_HEIGHT // 4, SCREEN_HEIGHT // 4 * 3)
-            AIBird(self, self._bird_image, x, y, self.pop[i])
-        # instantiate the pipes
-        self._spawn_pipe(80)  # the first pipe with xas the baseline
-        while self._front_pipe.rect.x < SCREEN_WIDTH:
-            self._spawn_pipe()
+        self._pipe_views.clear()
+        if self.steady_state is None or self._world.n_alive == 0:  # otherwise, the birds keep flying
+            self._human_id = None
+            self._world.reset(self.pop)
         # create the background
         Background(self, self._background_image)
+        # HUD lines: score, max score so far, generation and alive birds
+        self._hud_lines = [TextLine(self._hud, 10, 10 + i * (FONT_SIZE + 2), self.all_sprites) for i in range(4)]
+        if self._recorder is not None:
+            self._recorder.begin(self.current_generation)
 
     def _load_images(self):
         """
@@ -89,58 +113,23 @@ class Game:
         self._pipe_images = [_load_one_image(name) for name in ['pipetop.png', 'pipebottom.png']]
         self._background_image = _load_one_image('background.png')
         self._blue_bird_image = _load_one_image('bluebird.png')
+        # rotated bird images shared by all birds
+        self._bird_rotations = RotationCache(self._bird_image)
+        self._blue_bird_rotations = RotationCache(self._blue_bird_image)
 
-    def _spawn_pipe(self, front_x=None):
+    def run(self):
         """
-        Create a new pair of pipes in the font.
-        @:param front_x the x coordinate of the currently most front pipe. If None, then set self._front_pipe.rect.x
+        Play one round (generation) until all the birds die.
         """
-        if front_x is None:
-            front_x = self._front_pipe.rect.x
-        pipe_space = random.randint(self._min_pipe_space, MAX_PIPE_SPACE)
-        centerx = front_x + pipe_space
-        d_gap = MAX_PIPE_GAP - self._min_pipe_gap
-        d_space = MAX_PIPE_SPACE - self._min_pipe_space
-        if pipe_space > (self._min_pipe_space + MAX_PIPE_SPACE) / 2:
-            gap = random.randint(self._min_pipe_gap, MAX_PIPE_GAP)
-        else:
-            gap = random.randint(int(MAX_PIPE_GAP - d_gap * (pipe_space - self._min_pipe_space) / d_space),
-                                 MAX_PIPE_GAP) + 8
-        # if pipe space is too small, then the top_length should be similar to the previous one
-        if pipe_space - self._min_pipe_gap < d_space // 3:
-            top_length = self._front_pipe.length + random.randint(-50, 50)
-        else:
-            top_length = random.randint(MIN_PIPE_LENGTH, SCREEN_HEIGHT - gap - MIN_PIPE_LENGTH)
-        if self._front_pipe is not None:
-            gap += abs(top_length - self._front_pipe.length) // 10
-        bottom_length = SCREEN_HEIGHT - gap - top_length
-        top_pipe = Pipe(self, self._pipe_images[0], centerx, top_length, PipeType.TOP)
-        bottom_pipe = Pipe(self, self._pipe_images[1], centerx, bottom_length, PipeType.BOTTOM)
-        self._front_pipe = top_pipe
-        top_pipe.gap = gap
-        bottom_pipe.gap = gap
-
-    def run(self):
         self.playing = True
-        while self.playing:
-            self._handle_events()
-            self._update()
-            self._draw()
-            self._clock.tick(self._fps)
+        self.manager.switch_to(self)
+        self.manager.loop()
+        if self._recorder is not None:
+            self._recorder.end(max_score=self._max_score)
         if not self.running:
             return
         # one generation finished and perform evolution again
-        # if current score is very low, then we use a large mutation rate
-        pb = MUT_PB
-        if self._max_score < 500:
-            pb = MUT_PB * 3
-        elif self._max_score < 1000:
-            pb = MUT_PB * 2
-        elif self._max_score < 2000:
-            pb = MUT_PB * 1.5
-        elif self._max_score < 5000:
-            pb = MUT_PB * 1.2
-        self.pop = cgp.evolve(self.pop, pb, MU, LAMBDA)
+        self._evolve()
 
     def _pause(self):
         """
@@ -150,13 +139,15 @@ class Game:
             for event in pg.event.get():
                 if event.type == pg.QUIT:
                     self.playing = False
-                    self.running = False
+                    self.manager.quit()
                     return
                 if event.type == pg.KEYDOWN:
                     pressed = pg.key.get_pressed()
                     ctrl_held = pressed[pg.K_LCTRL] or pressed[pg.K_RCTRL]
                     if ctrl_held and event.key == pg.K_p:
                         self._is_paused = False
+                        # erase the "Paused" text in the next frame
+                        self.all_sprites.repaint_rect(self._screen.get_rect())
                         return
                 self._draw_text("Paused", x=SCREEN_WIDTH // 2 - 50, y=SCREEN_HEIGHT // 2 - 10,
                                 color=WHITE, size=2 * FONT_SIZE)
@@ -168,110 +159,161 @@ class Game:
         Create a human player.
         """
         # find a position in the middle of the screen to place the human bird
-        xs = [p.rect.right for p in self.pipes if p.rect.right < SCREEN_WIDTH // 2]
+        xs = [p.right for p in self._world.pipes if p.right < SCREEN_WIDTH // 2]
         if len(xs) > 0:
             x = max(xs) + 20
         else:
             x = SCREEN_WIDTH // 2 - 100
         y = SCREEN_HEIGHT // 2
-        self._human_bird = Bird(self, self._blue_bird_image, x, y)
+        self._human_id = self._world.add_bird(x, y)
+
+    def _human_alive(self):
+        return self._human_id is not None and self._world.alive[self._human_id]
+
+    def _set_speed(self, speed=None, turbo=None):
+        """
+        Set the number of simulation steps per rendered frame and/or turn the turbo mode on/off.
+        """
+        if speed is not None:
+            self._speed = speed
+        if turbo is not None:
+            self._turbo = turbo
+        self.manager.steps_per_frame = None if self._turbo else self._speed
+        self.manager.render_fps = TURBO_FPS if self._turbo else FPS
 
-    def _handle_events(self):
+    def handle_events(self):
         """
         Handle key events
         """
         for event in pg.event.get():
-            if event.type == pg.QUIT:
-                self.playing = False
-                self.running = False
-            elif event.type == pg.KEYDOWN:
+            if event.type == pg.KEYDOWN:
                 pressed = pg.key.get_pressed()
                 ctrl_held = pressed[pg.K_LCTRL] or pressed[pg.K_RCTRL]
                 if ctrl_held:
                     if event.key == pg.K_p:  # ctrl + p: pause the game
                         self._is_paused = True
                         self._pause()
-                    elif event.key == pg.K_1:  # ctrl + 1 (2, 3): standard frame rate
-                        self._fps = FPS
+                    elif event.key == pg.K_1:  # ctrl + 1 (2, 3): standard speed
+                        self._set_speed(1)
                     elif event.key == pg.K_2:
-                        self._fps = 2 * FPS
+                        self._set_speed(2)
                     elif event.key == pg.K_3:
-                        self._fps = 3 * FPS
+                        self._set_speed(3)
+                    elif event.key == pg.K_t:  # ctrl + t: turbo mode on/off
+                        self._set_speed(turbo=not self._turbo)
                     elif event.key == pg.K_h:  # ctrl+h: create a human player
-                        if not self._human_bird or not self._human_bird.alive():
+                        if not self._human_alive():
                             self._create_human_player()
                     elif event.key == pg.K_m:   # ctrl+m: music on/off
                         self.music_on = not self.music_on
                 elif event.key == pg.K_SPACE or event.key == pg.K_UP:   # space: flap the human player's bird
-                    if self._human_bird is not None and self._human_bird.alive():
-                        self._human_bird.flap()
+                    if self._human_alive():
+                        self._world.flap(self._human_id)
+                        if self.music_on:
+                            self.sounds.play('wing')
 
-        for bird in self.birds:
-            if bird is not self._human_bird:
-                self.try_flap(bird)
+    def update(self):
+        """
+        Perform one simulation step, or all the remaining steps of the round once it is fast-forwarded.
+        """
+        if not self.playing:
+            return
+        self._step()
+        while self.playing and self._fast_forward:
+            self._step()
+        if not self.playing:
+            self.manager.stop()
 
-    def _get_front_bottom_pipe(self, bird):
+    def _step(self):
         """
-        Get the most front pipe before the bird (the bottom one).
+        Perform one simulation step without drawing.
         """
-        front_bottom_pipe = min((p for p in self.pipes if p.type == PipeType.BOTTOM and p.rect.right >= bird.rect.left),
-                                key=lambda p: p.rect.x)
-        return front_bottom_pipe
+        n_evals, n_flaps = self._world.flap_birds()
+        self.n_evals += n_evals
+        if n_flaps and self.music_on:
+            self.sounds.play('wing')
+        if self._recorder is not None:
+            self._record_step()
+        self.playing = self._world.update()
+        if self.music_on:
+            for outside in self._world.crashed_outside.tolist():
+                self.sounds.play('die' if outside else 'hit')
+        if self.steady_state is None:
+            self._max_score = self._world.max_score
+        else:
+            self._max_score = max(self._max_score, int(self._world.score.max()))
+            self._n_evaluated += refill_slots(self._world, self.steady_state, self.pop, self._mut_rate)
+            self.playing = self._n_evaluated < self.n_birds
+        self._max_score_so_far = max(self._max_score_so_far, self._max_score)
+        if self.playing and not self._fast_forward and MAX_EVAL_FRAMES is not None and MAX_EVAL_SECONDS is not None:
+            self._check_fast_forward()
 
-    def try_flap(self, bird):
+    def _check_fast_forward(self):
         """
-        Try to flap the bird if needed
+        Fast-forward the rest of the round once all the alive birds are AI birds that have exceeded the wall time
+        budget MAX_EVAL_SECONDS: they are simulated without drawing until they die or are retired after MAX_EVAL_FRAMES
+        steps, which bounds the time for which the window does not respond.
         """
-        # compute the tree inputs: v, h, g
-        front_bottom_pipe = self._get_front_bottom_pipe(bird)
-        h = front_bottom_pipe.rect.x - bird.rect.x
-        v = front_bottom_pipe.rect.y - bird.rect.y
-        g = front_bottom_pipe.gap
-        if bird.eval(v, h, g) > 0:
-            bird.flap()
+        if not self._human_alive() and (self._world.evaluation_time() > MAX_EVAL_SECONDS).all():
+            self._fast_forward = True
 
-    def _update(self):
+    def _record_step(self):
         """
-        Update the state (position, life, etc.) of all sprites and the game
+        Record the state of the birds and pipes once the birds have decided whether to flap in this step.
         """
-        self.all_sprites.update()
-        # if all birds died, then game over
-        if not self.birds:
-            self.playing = False
-            return
-        # move the pipes backwards such that birds seem to fly
-        leading_bird = max(self.birds, key=lambda b: b.rect.x)
-        if leading_bird.rect.x < SCREEN_WIDTH / 3:
-            for bird in self.birds:
-                bird.moveby(dx=BIRD_X_SPEED)
-        else:
-            for pipe in self.pipes:
-                pipe.moveby(dx=-BIRD_X_SPEED)
-                if pipe.rect.x < -50:
-                    pipe.kill()
-        # count the score: one point per frame
-        for bird in self.birds:
-            bird.score += 1  # when a bird dies, its score will be set to the CGP individual's fitness automatically
+        world = self._world
+        ids = world.ids if self._human_id is None else np.where(world.ids == self._human_id, -1, world.ids)
+        birds = np.column_stack([ids, world.x, world.y, world.vel_y, world.inputs, world.flapped()])
+        pipes = [(bottom.x, top.length, bottom.length) for _, bottom, top in world._bottom_pipes]
+        self._recorder.record(birds, pipes)
 
-        self._max_score += 1
-        self._max_score_so_far = max(self._max_score_so_far, self._max_score)
-        # spawn a new pipe if necessary
-        while self._front_pipe.rect.x < SCREEN_WIDTH:
-            self._spawn_pipe()
+    def _sync_views(self):
+        """
+        Move the sprites to the current state of the world.
+        """
+        world = self._world
+        # pipes: create the views of the new pipes and remove the ones of the pipes that have been removed
+        pipes = set(world.pipes)
+        for pipe in [pipe for pipe in self._pipe_views if pipe not in pipes]:
+            self._pipe_views.pop(pipe).kill()
+        for pipe in world.pipes:
+            view = self._pipe_views.get(pipe)
+            if view is None:
+                self._pipe_views[pipe] = Pipe(self, self._pipe_images[0 if pipe.is_top else 1], pipe)
+            else:
+                view.rect.x = pipe.x
+        # birds: the first alive AI birds in the world, i.e., the parents of this generation first unless birds have
+        # been replaced in steady-state evolution
+        shown = world.ids != self._human_id if self._human_alive() else slice(None)
+        birds = zip(world.x[shown].tolist(), world.y[shown].tolist(), world.vel_y[shown].tolist())
+        n_shown = 0
+        for view, (x, y, vel_y) in zip(self._bird_views, birds):
+            view.show(x, y, vel_y)
+            n_shown += 1
+        for i, view in enumerate(self._bird_views):
+            if (i < n_shown) != view.alive():
+                if i < n_shown:
+                    self.all_sprites.add(view)
+                else:
+                    view.kill()
+        if self._human_alive():
+            i = world.position(self._human_id)
+            self._human_view.show(world.x[i], world.y[i], world.vel_y[i])
+            if not self._human_view.alive():
+                self.all_sprites.add(self._human_view)
+        elif self._human_view.alive():
+            self._human_view.kill()
 
-    def _draw(self):
-        self.all_sprites.draw(self._screen)
+    def draw(self):
+        self.sounds.flush()
+        self._sync_views()
         # show score
-        self._draw_text('Score: {}'.format(self._max_score), 10, 10)
-        self._draw_text('Max score so far: {}'.format(self._max_score_so_far), 10, 10 + FONT_SIZE + 2)
-        self._draw_text('Generation: {}'.format(self.current_generation), 10, 10 + 2 * (FONT_SIZE + 2))
-        n_alive = len(self.birds)
-        if self._human_bird is not None and self._human_bird.alive():
-            n_alive -= 1
-        self._draw_text('Alive: {} / {}'.format(n_alive, self.n_birds), 10, 10 + 3 * (FONT_SIZE + 2))
-        pg.display.update()
+        self._hud_lines[0].set_text('Score: {}'.format(self._max_score))
+        self._hud_lines[1].set_text('Max score so far: {}'.format(self._max_score_so_far))
+        self._hud_lines[2].set_text('Generation: {}'.format(self.current_generation))
+        n_alive = self._world.n_alive - self._human_alive()
+        self._hud_lines[3].set_text('Alive: {} / {}'.format(n_alive, self.n_birds))
+        pg.display.update(self.all_sprites.draw(self._screen))
 
     def _draw_text(self, text, x, y, color=WHITE, font=FONT_NAME, size=FONT_SIZE):
-        font = pg.font.SysFont(font, size)
-        text_surface = font.render(text, True, color)
-        self._screen.blit(text_surface, (x, y))
+        self._hud.draw_text(self._screen, text, x, y, color, font, size)
@@ -0,0 +1,59 @@
+"""
+Head-up display: text lines drawn on top of the game.
+"""
+import pygame as pg
+
+from settings import *
+
+
+class HUD:
+    """
+    Draw text lines on a surface. Fonts are only looked up once, and the text of a line (identified by its position)
+    is only rendered again when its value changes.
+    """
+
+    def __init__(self):
+        self._fonts = {}  # (name, size) -> font
+        self._lines = {}  # (x, y) -> ((text, color, font name, size), rendered surface)
+
+    def _get_font(self, name, size):
+        font = self._fonts.get((name, size))
+        if font is None:
+            font = self._fonts[(name, size)] = pg.font.SysFont(name, size)
+        return font
+
+    def render(self, text, x, y, color=WHITE, font=FONT_NAME, size=FONT_SIZE):
+        """
+        Get the surface of the text line at (x, y), which is rendered only if it differs from the last one.
+        """
+        key = (text, color, font, size)
+        line = self._lines.get((x, y))
+        if line is None or line[0] != key:
+            line = self._lines[(x, y)] = key, self._get_font(font, size).render(text, True, color)
+        return line[1]
+
+    def draw_text(self, surface, text, x, y, color=WHITE, font=FONT_NAME, size=FONT_SIZE):
+        surface.blit(self.render(text, x, y, color, font, size), (x, y))
+
+
+class TextLine(pg.sprite.DirtySprite):
+    """
+    A text line of the HUD as a sprite on top of all the other sprites, which is only marked dirty when its text
+    changes such that it works with dirty-rect rendering (`pygame.sprite.LayeredDirty`).
+    """
+
+    def __init__(self, hud, x, y, *groups):
+        self._layer = 3
+        super().__init__(*groups)
+        self._hud = hud
+        self._x = x
+        self._y = y
+        self.image = pg.Surface((0, 0))
+        self.rect = self.image.get_rect(x=x, y=y)
+
+    def set_text(self, text, color=WHITE, font=FONT_NAME, size=FONT_SIZE):
+        image = self._hud.render(text, self._x, self._y, color, font, size)
+        if image is not self.image:
+            self.image = image
+            self.rect = image.get_rect(x=self._x, y=self._y)
+            self.dirty = 1
@@ -0,0 +1,117 @@
+"""
+Island model of evolution.
+
+Several populations (islands) evolve independently, one process each, in headless worlds. Every few generations, each
+island sends copies of its best individuals (migrants) to its neighbors through pipes, where they replace some
+offspring. This makes use of multi-core machines and keeps the diversity of the overall population.
+"""
+import multiprocessing as mp
+import random
+import threading
+
+import numpy as np
+
+import cgp
+from settings import *
+from world import HeadlessGame
+
+
+def migration_targets(index, n_islands, topology=MIGRATION_TOPOLOGY):
+    """
+    Get the islands to which island *index* sends its migrants.
+
+    :param topology: 'ring': to the next island only; 'full': to all the other islands
+    :return: a list of island indices
+    """
+    if topology == 'ring':
+        return [(index + 1) % n_islands] if n_islands > 1 else []
+    if topology == 'full':
+        return [j for j in range(n_islands) if j != index]
+    raise ValueError(f"Unknown migration topology: '{topology}'. It should be 'ring' or 'full'.")
+
+
+def _run_island(index, seed, n_generations, interval, n_migrants, inboxes, outboxes, results):
+    """
+    Evolve one island and put its final population into the *results* queue. In steady-state evolution (see
+    STEADY_STATE), the migrants are taken from the pool of parents and the immigrants are inserted into it.
+
+    :param inboxes: connections from which the migrants of other islands are received
+    :param outboxes: connections to which the migrants of this island are sent
+    """
+    random.seed(seed)
+    cgp.seed(seed)
+    game = HeadlessGame(n_workers=None)
+    while game.current_generation < n_generations:
+        game.reset()
+        game.run()
+        if VERBOSE:
+            print(f'Island {index}, generation {game.current_generation}: max score {game._max_score}')
+        if game.current_generation % interval != 0 or game.current_generation == n_generations:
+            continue
+        # after evolution, the population is composed of the sorted parents followed by the offspring. In steady-state
+        # evolution, the best individuals are kept in the pool of parents instead.
+        pool = game.steady_state.parents if game.steady_state is not None else game.pop[:MU]
+        migrants = sorted(pool, key=lambda ind: ind.fitness, reverse=True)[:n_migrants]
+        genomes = [(ind.to_bytes(), ind.fitness) for ind in migrants]
+        # send from threads while receiving: since all islands send before receiving, a send that does not fit into
+        # the buffer of a pipe would otherwise block every island forever
+        senders = [threading.Thread(target=outbox.send, args=(genomes,)) for outbox in outboxes]
+        for sender in senders:
+            sender.start()
+        received = [item for inbox in inboxes for item in inbox.recv()]
+        for sender in senders:
+            sender.join()
+        if game.steady_state is not None:
+            # the immigrants compete with their fitness on the source island for the pool of parents, like the birds
+            # that die here, and their children fly from the next replacement on
+            for genome, fitness in received:
+                immigrant = cgp.Individual.from_bytes(genome)
+                immigrant.fitness = fitness
+                game.steady_state.insert(immigrant)
+        else:
+            # the immigrants replace the last offspring and will be evaluated in the next generation
+            immigrants = [cgp.Individual.from_bytes(genome) for genome, _ in received][:LAMBDA]
+            if immigrants:
+                game.pop[-len(immigrants):] = immigrants
+    pop = game.pop
+    if game.steady_state is not None:  # the best birds that have died are only kept as parents
+        pop = game.steady_state.parents + pop
+    results.put((index, [(ind.to_bytes(), ind.fitness) for ind in pop]))
+
+
+def run_islands(n_islands=N_ISLANDS, n_generations=N_GEN, interval=MIGRATION_INTERVAL, n_migrants=N_MIGRANTS,
+                topology=MIGRATION_TOPOLOGY, seed=RANDOM_SEED):
+    """
+    Evolve *n_islands* populations in parallel processes with periodic migration.
+
+    :param interval: number of generations between two migrations
+    :param n_migrants: number of best individuals sent by an island to each of its targets in a migration
+    :param topology: migration topology, see `migration_targets`
+    :param seed: seed from which an independent seed is derived for each island
+    :return: the final populations of all islands concatenated, ordered by island, including the pools of parents
+        in steady-state evolution
+    """
+    seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(n_islands)]
+    inboxes = [[] for _ in range(n_islands)]
+    outboxes = [[] for _ in range(n_islands)]
+    for i in range(n_islands):
+        for j in migration_targets(i, n_islands, topology):
+            receiver, sender = mp.Pipe(duplex=False)
+            outboxes[i].append(sender)
+            inboxes[j].append(receiver)
+    results = mp.Queue()
+    processes = [mp.Process(target=_run_island, args=(i, seeds[i], n_generations, interval, n_migrants,
+                                                      inboxes[i], outboxes[i], results))
+                 for i in range(n_islands)]
+    for p in processes:
+        p.start()
+    pops = dict(results.get() for _ in range(n_islands))
+    for p in processes:
+        p.join()
+    pop = []
+    for i in range(n_islands):
+        for genome, fitness in pops[i]:
+            ind = cgp.Individual.from_bytes(genome)
+            ind.fitness = fitness
+            pop.append(ind)
+    return pop
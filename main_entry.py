@@ -1,35 +1,73 @@
 """
 Entrance of the program.
 """
-from game import *
 from postprocessing import *
+import os
 import random
 
+import cgp
+from checkpoint import load_checkpoint, save_checkpoint
+from export import export_controller
+from islands import run_islands
+from profiling import Profiler
+from telemetry import Telemetry
+
+if HEADLESS:
+    from world import HeadlessGame as Game
+else:
+    from game import Game
+
 
 def main():
     random.seed(RANDOM_SEED)
-    game = Game()
-    while game.running and game.current_generation < N_GEN:
-        game.reset()
-        game.run()
+    cgp.seed(RANDOM_SEED)
+    if N_ISLANDS is not None:
+        pop = run_islands()
+    else:
+        game = Game()
+        profiler = None
+        if PROFILE:
+            profiler = Profiler(PROFILE_FILE)
+            profiler.instrument(game)
+        if TELEMETRY_FILE is not None:
+            game.telemetry = Telemetry(TELEMETRY_FILE)
+        if CHECKPOINT_FILE is not None and RESUME and os.path.exists(CHECKPOINT_FILE):
+            load_checkpoint(game, CHECKPOINT_FILE)
+            print(f'Resumed from {CHECKPOINT_FILE} at generation {game.current_generation}')
+        while game.running and game.current_generation < N_GEN:
+            game.reset()
+            game.run()
+            if profiler is not None:
+                profiler.end_generation(game.current_generation)
+            if CHECKPOINT_FILE is not None and game.running and game.current_generation % CHECKPOINT_INTERVAL == 0:
+                save_checkpoint(game, CHECKPOINT_FILE)
+        if game.telemetry is not None:
+            game.telemetry.close()
+        pop = game.pop
+        if game.steady_state is not None:  # the best birds that have died are only kept as parents
+            pop = game.steady_state.parents + pop
 
     if PP_FORMULA or PP_GRAPH_VISUALIZATION:
-        gs = [extract_computational_subgraph(ind) for ind in game.pop]
+        gs = [extract_computational_subgraph(ind) for ind in pop]
         # note that only the MU parents have been evaluated and have fitness values
         if PP_FORMULA:
             print("Writing formula to ./pp/formula.txt ...")
+            formulas = simplify_all(gs, ['v', 'h', 'g'])
             with open("./pp/formula.txt", 'w') as f:
-                for i, g in enumerate(gs):
-                    formula = simplify(g, ['v', 'h', 'g'])
+                for i, formula in enumerate(formulas):
                     formula = round_expr(formula, PP_FORMULA_NUM_DIGITS)
                     print(
-                        f"{i}\n score: {game.pop[i].fitness}\n formula: {formula}")
+                        f"{i}\n score: {pop[i].fitness}\n formula: {formula}")
                     f.write(
-                        f"{i}\n score: {game.pop[i].fitness}\n formula: {formula}\n")
+                        f"{i}\n score: {pop[i].fitness}\n formula: {formula}\n")
         if PP_GRAPH_VISUALIZATION:
             print("Drawing graphs to files in folder ./pp ...")
             for i, g in enumerate(gs):
                 visualize(g, f"./pp/g{i}.pdf", input_names=['v', 'h', 'g'])
+    if PP_EXPORT_CONTROLLER:
+        best = max((ind for ind in pop if ind.fitness is not None), key=lambda ind: ind.fitness)
+        print("Exporting the best controller to ./pp/controller.py ...")
+        export_controller(best, "./pp/controller.py", score=best.fitness)
 
 
 if __name__ == '__main__':
@@ -10,8 +10,14 @@ to be binary though.
 """
 import cgp
 import sympy as sp
+import hashlib
+import multiprocessing as mp
+import multiprocessing.connection
 import operator
 import math
+import signal
+import struct
+import time
 from typing import Dict, Sequence
 import networkx as nx
 from settings import *
@@ -70,7 +76,101 @@ def extract_computational_subgraph(ind: cgp.Individual) -> nx.MultiDiGraph:
     return g
 
 
-def simplify(g: nx.MultiDiGraph, input_names: Sequence = None, symbolic_function_map: Dict = None):
+def subgraph_keys(g: nx.MultiDiGraph) -> Dict:
+    """Compute a canonical hash of the subgraph rooted at each node of the computational graph `g`.
+
+    Two nodes get the same key if they apply the same function to inputs with the same keys and weights, no matter
+    where they are in the CGP genome. The key of the output node thus identifies the formula of the whole graph.
+
+    Returns:
+        Dict: node id -> key (bytes)
+    """
+    keys = {}
+    for node_id in nx.topological_sort(g):
+        if node_id < 0:  # inputs in CGP
+            keys[node_id] = str(node_id).encode()
+        else:
+            h = hashlib.blake2b(g.nodes[node_id]["func"].encode(), digest_size=16)
+            for input_node_id, weight in _ordered_inputs(g, node_id):
+                h.update(keys[input_node_id])
+                h.update(struct.pack('<d', weight))
+            keys[node_id] = h.digest()
+    return keys
+
+
+def _ordered_inputs(g: nx.MultiDiGraph, node_id):
+    """(input node id, weight) of the inputs of a function node in the order of its arguments."""
+    inputs = []
+    for input_node_id in g.predecessors(node_id):
+        # possibly parallel edges
+        for attr in g.get_edge_data(input_node_id, node_id).values():
+            inputs.append((attr["order"], input_node_id, attr["weight"]))
+    inputs.sort(key=operator.itemgetter(0))
+    return [(input_node_id, weight) for _, input_node_id, weight in inputs]
+
+
+def build_expression(g: nx.MultiDiGraph, input_names: Sequence = None, symbolic_function_map: Dict = None):
+    """Build the raw symbolic expression of the computational graph `g` without any simplification.
+
+    The expression of each node is built once, and nodes with the same subgraph key (see `subgraph_keys`) share a
+    single expression. Only the cheap canonicalization performed automatically by `sympy` on construction (flattening
+    of sums and products, merging of numeric coefficients and like terms) is applied.
+
+    Returns:
+        a symbolic expression
+    """
+    if symbolic_function_map is None:
+        symbolic_function_map = DEFAULT_SYMBOLIC_FUNCTION_MAP
+    keys = subgraph_keys(g)
+    by_key = {}  # key -> expression, such that common subexpressions are only built once
+    d = dict()
+    for node_id in keys:  # in topological order
+        key = keys[node_id]
+        if key not in by_key:
+            if node_id < 0:  # inputs in CGP
+                by_key[key] = sp.Symbol(f"v{-node_id}" if input_names is None else input_names[-node_id - 1])
+            else:  # a function node
+                args = (weight * d[input_node_id] for input_node_id, weight in _ordered_inputs(g, node_id))
+                by_key[key] = symbolic_function_map[g.nodes[node_id]["func"]](*args)
+        d[node_id] = by_key[key]
+    # the unique output is the last node
+    return d[node_id]
+
+
+# (output subgraph key, input names) -> simplified expression of the graphs simplified so far
+_simplified_expressions = {}
+
+
+def _simplification_worker(conn):
+    """Simplify the expressions received from the connection `conn` and send back the results one by one."""
+    # a library initialized before the fork may handle SIGTERM, e.g., SDL turns it into a quit event, such that the
+    # worker could not be terminated
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    while True:
+        conn.send(sp.simplify(conn.recv()))
+
+
+class _SimplificationWorker:
+    """A worker process running `_simplification_worker`, which is reused until a simplification times out."""
+
+    def __init__(self):
+        self.conn, child_conn = mp.Pipe()
+        self.process = mp.Process(target=_simplification_worker, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def terminate(self):
+        self.process.terminate()
+        self.process.join()
+        self.conn.close()
+
+
+# the idle worker processes, which are kept such that simplifying a few graphs does not pay the process startup
+_idle_workers = []
+
+
+def simplify(g: nx.MultiDiGraph, input_names: Sequence = None, symbolic_function_map: Dict = None,
+             timeout=PP_SIMPLIFICATION_TIMEOUT):
     """Compile computational graph `g` into a (possibly simplified) symbolic expression.
 
     Args:
@@ -79,6 +179,7 @@ def simplify(g: nx.MultiDiGraph, input_names: Sequence = None, symbolic_function
             If `None`, then the `DEFAULT_SYMBOLIC_FUNCTION_MAP` is used.
         input_names (Sequence): a list of names, each for one input. If `None`, then a default name "vi" is used
             for the i-th input.
+        timeout (float, optional): time budget (s) of the simplification. See `simplify_all`.
     
     Return:
         a (simplified) symbol expression
@@ -86,32 +187,68 @@ def simplify(g: nx.MultiDiGraph, input_names: Sequence = None, symbolic_function
     For example, `add(sub(3, 3), x)` may be simplified to `x`. Note that this method is used to simplify the 
     **final** solution rather than during evolution. 
     """
-    if symbolic_function_map is None:
-        symbolic_function_map = DEFAULT_SYMBOLIC_FUNCTION_MAP
+    return simplify_all([g], input_names, symbolic_function_map, timeout)[0]
 
-    # toplogical sort such that i appears before j if there is an edge i->j
-    ts = list(nx.topological_sort(g))
-    d = dict()
-    for node_id in ts:
-        if node_id < 0:  # inputs in CGP
-            d[node_id] = sp.Symbol(
-                f"v{-node_id}" if input_names is None else input_names[-node_id - 1])
-        else:  # a function node
-            inputs = []
-            # print(g.in_edges(node_id))
-            for input_node_id in g.predecessors(node_id):
-                # possibly parallel edges
-                for attr in g.get_edge_data(input_node_id, node_id).values():
-                    inputs.append(
-                        (input_node_id, attr["weight"], attr["order"]))
-            inputs.sort(key=operator.itemgetter(2))
-            args = (ip[1] * d[ip[0]] for ip in inputs)
-            func = g.nodes[node_id]["func"]
-            sym_func = symbolic_function_map[func]
-            r = sym_func(*args)
-            d[node_id] = sp.simplify(r) if PP_FORMULA_SIMPLIFICATION else r
-    # the unique output is the last node
-    return d[ts[-1]]
+
+def simplify_all(graphs: Sequence, input_names: Sequence = None, symbolic_function_map: Dict = None,
+                 timeout=PP_SIMPLIFICATION_TIMEOUT, n_workers=None):
+    """Compile computational graphs into (possibly simplified) symbolic expressions in parallel.
+
+    The raw expression of each graph is built by `build_expression`, and then `sympy.simplify` is called only once on
+    the whole expression in a worker process if `PP_FORMULA_SIMPLIFICATION` is True. The results are memoized by the
+    subgraph key of the output node, such that graphs computing the same formula are only simplified once.
+
+    Args:
+        graphs (Sequence): computational graphs, e.g., extracted from the individuals of a population
+        timeout (float, optional): time budget (s) of the simplification of each graph, counted from when a worker
+            starts simplifying it. If a graph cannot be simplified in time, then its worker is terminated and the raw
+            expression is returned instead, which is not memoized. If `None`, then the graphs are simplified one by
+            one in this process without any time limit.
+        n_workers (int, optional): number of worker processes. Defaults to the number of CPUs.
+
+    Return:
+        a list of symbolic expressions, one for each graph
+    """
+    # the output node is the last one in topological order, and the expressions depend on the input names
+    names = tuple(input_names or ())
+    keys = [(list(subgraph_keys(g).values())[-1], names) for g in graphs]
+    exprs = {}
+    for g, key in zip(graphs, keys):
+        if key not in exprs:
+            exprs[key] = build_expression(g, input_names, symbolic_function_map)
+    if not PP_FORMULA_SIMPLIFICATION:
+        return [exprs[key] for key in keys]
+    results = {key: _simplified_expressions[key] for key in exprs if key in _simplified_expressions}
+    todo = [key for key in exprs if key not in results]
+    if timeout is None:
+        for key in todo:
+            _simplified_expressions[key] = results[key] = sp.simplify(exprs[key])
+    elif todo:
+        n_workers = min(n_workers or mp.cpu_count(), len(todo))
+        busy = {}  # connection -> (worker, key, deadline) of the graphs being simplified
+        while todo or busy:
+            while todo and len(busy) < n_workers:
+                worker = _idle_workers.pop() if _idle_workers else _SimplificationWorker()
+                key = todo.pop(0)
+                worker.conn.send(exprs[key])
+                busy[worker.conn] = (worker, key, time.monotonic() + timeout)
+            next_deadline = min(deadline for _, _, deadline in busy.values())
+            for conn in mp.connection.wait(list(busy), max(next_deadline - time.monotonic(), 0)):
+                worker, key, _ = busy.pop(conn)
+                try:
+                    _simplified_expressions[key] = results[key] = conn.recv()
+                    _idle_workers.append(worker)
+                except EOFError:  # the worker has died, e.g., because sympy raised an error
+                    worker.terminate()
+                    results[key] = exprs[key]
+            now = time.monotonic()
+            for conn, (worker, key, deadline) in list(busy.items()):
+                if deadline <= now:
+                    del busy[conn]
+                    worker.terminate()  # stop the simplification still running
+                    print(f'Simplification timed out after {timeout} s. The raw expression is used instead.')
+                    results[key] = exprs[key]
+    return [results[key] for key in keys]
 
 
 def round_expr(expr, num_digits):
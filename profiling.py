@@ -0,0 +1,112 @@
+"""
+Profiling of the game loop.
+
+A `Profiler` instruments a game by wrapping some of its methods, each of which makes up a phase of the loop, such that
+the wall time of each call is recorded. Methods returning numbers of events (e.g., flaps) also feed counters.
+Nothing is wrapped unless a profiler is created, so there is no overhead at all when profiling is disabled.
+
+At the end of each generation, the distribution of each phase and counter is summarized (count, total, mean,
+percentiles and a histogram) and appended to a file as a JSON line.
+"""
+import functools
+import json
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from settings import *
+
+# lower bin edges of the time histograms (s): 0 and 4 bins per decade from 1 us to 10 s
+TIME_BINS = np.concatenate([[0], np.logspace(-6, 1, 29)])
+# lower bin edges of the counter histograms: 0, 1, 2-3, 4-7, ...
+COUNT_BINS = np.concatenate([[0], 2 ** np.arange(21)])
+
+# (object path, method name, phase, counters fed by the returned values) instrumented in the game if they exist
+GAME_PHASES = [
+    ('', 'handle_events', 'events', None),
+    ('_world', 'flap_birds', 'eval', ('evals', 'flaps')),  # CGP evaluation of all the birds
+    ('_world', 'kill_crashed_birds', 'collision', ('collisions',)),
+    ('_world', 'update', 'update', None),  # including the collision check
+    ('', 'draw', 'draw', None),
+    ('manager', 'tick', 'idle', None),  # waiting for the next frame
+    ('', '_evolve', 'evolve', None),
+]
+
+
+class Profiler:
+    """
+    Record the wall time of phases and the values of counters, and summarize them per generation.
+    """
+
+    def __init__(self, file=PROFILE_FILE):
+        """
+        :param file: the JSON lines file to which the per-generation summaries are appended. If None, they are only
+            printed.
+        """
+        self.file = file
+        self._samples = defaultdict(list)  # name -> values in the current generation
+        self._counters = set()  # names of the samples that are counts instead of time
+
+    def wrap(self, obj, method_name, phase, counters=None):
+        """
+        Replace the method *method_name* of *obj* by a wrapper that records the time of each call as *phase*.
+        If a tuple of *counters* is given, then the tuple of numbers (or the single number if there is only one
+        counter) returned by the method is recorded into these counters.
+        """
+        method = getattr(obj, method_name)
+        times = self._samples[phase]
+        counts = [self._samples[counter] for counter in counters] if counters else None
+        self._counters.update(counters or ())
+        perf_counter = time.perf_counter
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            result = method(*args, **kwargs)
+            times.append(perf_counter() - start)
+            if counts is not None:
+                for samples, value in zip(counts, result if len(counts) > 1 else (result,)):
+                    samples.append(value)
+            return result
+        setattr(obj, method_name, wrapper)
+
+    def instrument(self, game):
+        """
+        Wrap the phases in GAME_PHASES that *game* has.
+        """
+        for path, method_name, phase, counters in GAME_PHASES:
+            obj = getattr(game, path, None) if path else game
+            if obj is not None and callable(getattr(obj, method_name, None)):
+                self.wrap(obj, method_name, phase, counters)
+
+    def summary(self):
+        """
+        Summarize the samples of the current generation.
+        :return: a dict, name -> statistics of the samples of this phase or counter
+        """
+        stats = {}
+        for name, samples in self._samples.items():
+            if not samples:
+                continue
+            a = np.asarray(samples, dtype=float)
+            bins = COUNT_BINS if name in self._counters else TIME_BINS
+            hist, _ = np.histogram(a, np.concatenate([bins, [np.inf]]))
+            p50, p90, p99 = np.percentile(a, [50, 90, 99]).tolist()
+            stats[name] = {'n': len(a), 'total': a.sum().item(), 'mean': a.mean().item(), 'p50': p50, 'p90': p90,
+                           'p99': p99, 'max': a.max().item(), 'bins': bins.tolist(), 'hist': hist.tolist()}
+        return stats
+
+    def end_generation(self, generation):
+        """
+        Print a summary of the current generation, append it to the file if any, and clear the samples.
+        """
+        stats = self.summary()
+        print(f'Generation {generation} profile: ' + ', '.join(
+            f"{name} {s['total']:.0f}" if name in self._counters else f"{name} {s['total'] * 1e3:.1f} ms"
+            for name, s in stats.items()))
+        if self.file is not None:
+            with open(self.file, 'a') as f:
+                f.write(json.dumps({'generation': generation, 'phases': stats}) + '\n')
+        for samples in self._samples.values():
+            samples.clear()
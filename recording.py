@@ -0,0 +1,187 @@
+"""
+Recording of the game state.
+
+The visual game can record the state of each simulation step into a directory, one subdirectory per generation, such
+that any generation can be replayed later without running evolution or evaluating CGP again (see `replay.py`).
+Two tables are recorded in columnar form:
+
+- birds: one row per bird alive in a step, see BIRD_COLUMNS
+- pipes: one row per pair of pipes in a step, see PIPE_COLUMNS
+
+Each table is written into fixed-size chunks of float32 columns (`<table>_<chunk>.npy` files of shape
+(n_columns, chunk_rows)), which are memory-mapped both when writing and reading. The rows of step *k* of a table are
+rows ``index[k]`` to ``index[k + 1]`` of the table, where the index is saved in `index.npy` at the end of the
+generation together with `meta.json`.
+"""
+import glob
+import json
+import os.path
+
+import numpy as np
+
+from settings import *
+
+BIRD_COLUMNS = ('id', 'x', 'y', 'vel_y', 'v', 'h', 'g', 'flap')  # id: index in the population, -1 for the human
+PIPE_COLUMNS = ('x', 'top_length', 'bottom_length')
+TABLES = {'birds': BIRD_COLUMNS, 'pipes': PIPE_COLUMNS}
+
+
+def generation_dir(directory, generation):
+    return os.path.join(directory, f'gen_{generation:05d}')
+
+
+class _ChunkedWriter:
+    """
+    Append rows to a table stored in memory-mapped chunks.
+    """
+
+    def __init__(self, directory, name, n_columns, chunk_rows):
+        self._directory = directory
+        self._name = name
+        self._n_columns = n_columns
+        self._chunk_rows = chunk_rows
+        self._chunk = None
+        self._n_chunks = 0
+        self.n_rows = 0
+
+    def append(self, rows):
+        """
+        :param rows: an array of shape (n, n_columns)
+        """
+        start = 0
+        while start < len(rows):
+            offset = self.n_rows % self._chunk_rows
+            if offset == 0:
+                self._new_chunk()
+            n = min(len(rows) - start, self._chunk_rows - offset)
+            self._chunk[:, offset:offset + n] = rows[start:start + n].T
+            start += n
+            self.n_rows += n
+
+    def _new_chunk(self):
+        if self._chunk is not None:
+            self._chunk.flush()
+        file = os.path.join(self._directory, f'{self._name}_{self._n_chunks:05d}.npy')
+        self._chunk = np.lib.format.open_memmap(file, mode='w+', dtype=np.float32,
+                                                shape=(self._n_columns, self._chunk_rows))
+        self._n_chunks += 1
+
+    def close(self):
+        if self._chunk is not None:
+            self._chunk.flush()
+            self._chunk = None
+
+
+class Recorder:
+    """
+    Record the state of each step of the game into *directory*.
+    """
+
+    def __init__(self, directory=RECORD_DIR, chunk_rows=RECORD_CHUNK_ROWS):
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        self._generation = None
+        self._writers = None
+        self._index = None  # [(first bird row, first pipe row)] of each step
+
+    def begin(self, generation):
+        """
+        Start recording a new generation. The recording of the previous one is ended if necessary.
+        """
+        if self._generation is not None:
+            self.end()
+        self._generation = generation
+        path = generation_dir(self.directory, generation)
+        os.makedirs(path, exist_ok=True)
+        for file in glob.glob(os.path.join(path, '*')):  # an older recording of the same generation
+            os.remove(file)
+        self._writers = {name: _ChunkedWriter(path, name, len(columns), self.chunk_rows)
+                         for name, columns in TABLES.items()}
+        self._index = []
+
+    def record(self, birds, pipes):
+        """
+        Record one step.
+        :param birds: an array (or a list of tuples) with one row for each bird, whose items are given by BIRD_COLUMNS
+        :param pipes: an array (or a list of tuples) with one row for each pair of pipes, given by PIPE_COLUMNS
+        """
+        self._index.append((self._writers['birds'].n_rows, self._writers['pipes'].n_rows))
+        if len(birds):
+            self._writers['birds'].append(np.array(birds, dtype=np.float32))
+        if len(pipes):
+            self._writers['pipes'].append(np.array(pipes, dtype=np.float32))
+
+    def end(self, **meta):
+        """
+        End the recording of the current generation by saving its index and metadata.
+        :param meta: additional metadata, e.g., the max score
+        """
+        if self._generation is None:
+            return
+        self._index.append((self._writers['birds'].n_rows, self._writers['pipes'].n_rows))
+        path = generation_dir(self.directory, self._generation)
+        np.save(os.path.join(path, 'index.npy'), np.array(self._index, dtype=np.int64))
+        for writer in self._writers.values():
+            writer.close()
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'generation': self._generation, 'n_steps': len(self._index) - 1,
+                       'chunk_rows': self.chunk_rows, 'tables': TABLES, **meta}, f)
+        self._generation = None
+
+
+class _ChunkedTable:
+    """
+    Read the rows of a table stored in memory-mapped chunks.
+    """
+
+    def __init__(self, path, name, chunk_rows):
+        self._chunk_rows = chunk_rows
+        self._chunks = [np.load(file, mmap_mode='r')
+                        for file in sorted(glob.glob(os.path.join(path, f'{name}_*.npy')))]
+
+    def rows(self, start, stop):
+        """
+        :return: an array of shape (stop - start, n_columns)
+        """
+        parts = []
+        while start < stop:
+            i_chunk, offset = divmod(start, self._chunk_rows)
+            n = min(stop - start, self._chunk_rows - offset)
+            parts.append(self._chunks[i_chunk][:, offset:offset + n])
+            start += n
+        if not parts:
+            return np.empty((0, len(self._chunks[0]) if self._chunks else 0), dtype=np.float32)
+        return np.concatenate(parts, axis=1).T
+
+
+class GenerationRecording:
+    """
+    The recording of one generation.
+    """
+
+    def __init__(self, directory, generation):
+        path = generation_dir(directory, generation)
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.generation = generation
+        self.n_steps = self.meta['n_steps']
+        self._index = np.load(os.path.join(path, 'index.npy'))
+        self._tables = {name: _ChunkedTable(path, name, self.meta['chunk_rows']) for name in TABLES}
+
+    def step(self, k):
+        """
+        :return: (birds, pipes) in step *k*, arrays whose columns are given by BIRD_COLUMNS and PIPE_COLUMNS
+        """
+        (bird_start, pipe_start), (bird_stop, pipe_stop) = self._index[k], self._index[k + 1]
+        return self._tables['birds'].rows(bird_start, bird_stop), self._tables['pipes'].rows(pipe_start, pipe_stop)
+
+
+def recorded_generations(directory=RECORD_DIR):
+    """
+    :return: the sorted generations whose recording is complete in *directory*
+    """
+    generations = []
+    for path in glob.glob(os.path.join(directory, 'gen_*')):
+        if os.path.exists(os.path.join(path, 'meta.json')):
+            generations.append(int(os.path.basename(path)[len('gen_'):]))
+    return sorted(generations)
@@ -0,0 +1,134 @@
+"""
+Replay of recorded generations (see `recording.py`).
+
+The recorded birds and pipes are drawn step by step without any CGP evaluation or physics, and the replay can be
+scrubbed forward and backward.
+
+Usage: python replay.py <record directory> [generation]
+
+Keys:
+    space: play/pause
+    right/left: one step forward/backward (hold shift for 10 steps, ctrl for 100 steps)
+    up/down: faster/slower
+    r: play backward/forward
+    home/end: first/last step
+    page down/page up: next/previous recorded generation
+"""
+import os.path
+import sys
+
+import pygame as pg
+
+from hud import HUD
+from recording import GenerationRecording, recorded_generations
+from scenes import AbstractScene, SceneManager
+from settings import *
+from sprites import RotationCache
+from world import bird_angle
+
+SPEEDS = [1, 2, 4, 8, 16]  # steps per rendered frame
+
+
+class Replay(AbstractScene):
+    def __init__(self, manager, directory, generation=None):
+        super().__init__(manager)
+        self._directory = directory
+        self._generations = recorded_generations(directory)
+        if not self._generations:
+            raise ValueError(f'No recorded generation in {directory}')
+        self._load_images()
+        self._hud = HUD()
+        self._recording = None
+        self._step = 0
+        self._playing = True
+        self._direction = 1
+        self._i_speed = 0
+        self._open(generation if generation is not None else self._generations[0])
+
+    def _load_images(self):
+        def _load_one_image(file_name):
+            return pg.image.load(os.path.join(IMG_DIR, file_name)).convert_alpha()
+
+        self._pipe_images = [_load_one_image(name) for name in ['pipetop.png', 'pipebottom.png']]
+        self._background_image = _load_one_image('background.png')
+        self._bird_rotations = RotationCache(_load_one_image('bird.png'))
+        self._blue_bird_rotations = RotationCache(_load_one_image('bluebird.png'))
+
+    def _open(self, generation):
+        self._recording = GenerationRecording(self._directory, generation)
+        self._step = 0
+
+    def _seek(self, step):
+        self._step = max(min(step, self._recording.n_steps - 1), 0)
+
+    def _switch_generation(self, offset):
+        i = self._generations.index(self._recording.generation) + offset
+        if 0 <= i < len(self._generations):
+            self._open(self._generations[i])
+
+    def handle_events(self):
+        for event in pg.event.get():
+            if event.type != pg.KEYDOWN:
+                continue
+            n_steps = 100 if event.mod & pg.KMOD_CTRL else 10 if event.mod & pg.KMOD_SHIFT else 1
+            if event.key == pg.K_SPACE:
+                self._playing = not self._playing
+            elif event.key == pg.K_RIGHT:
+                self._playing = False
+                self._seek(self._step + n_steps)
+            elif event.key == pg.K_LEFT:
+                self._playing = False
+                self._seek(self._step - n_steps)
+            elif event.key == pg.K_UP:
+                self._i_speed = min(self._i_speed + 1, len(SPEEDS) - 1)
+            elif event.key == pg.K_DOWN:
+                self._i_speed = max(self._i_speed - 1, 0)
+            elif event.key == pg.K_r:
+                self._direction = -self._direction
+            elif event.key == pg.K_HOME:
+                self._seek(0)
+            elif event.key == pg.K_END:
+                self._seek(self._recording.n_steps - 1)
+            elif event.key == pg.K_PAGEDOWN:
+                self._switch_generation(1)
+            elif event.key == pg.K_PAGEUP:
+                self._switch_generation(-1)
+        self.manager.steps_per_frame = SPEEDS[self._i_speed]
+
+    def update(self):
+        if self._playing:
+            self._seek(self._step + self._direction)
+
+    def draw(self):
+        screen = self.manager.screen
+        for x in range(0, SCREEN_WIDTH, self._background_image.get_width()):
+            screen.blit(self._background_image, (x, 0))
+        birds, pipes = self._recording.step(self._step)
+        top_image, bottom_image = self._pipe_images
+        width = top_image.get_width()
+        for x, top_length, bottom_length in pipes.astype(int).tolist():
+            screen.blit(top_image, (x, 0), (0, top_image.get_height() - top_length, width, top_length))
+            screen.blit(bottom_image, (x, SCREEN_HEIGHT - bottom_length), (0, 0, width, bottom_length))
+        for id_, x, y, vel_y, *_ in birds.tolist():
+            rotations = self._blue_bird_rotations if id_ < 0 else self._bird_rotations
+            screen.blit(rotations.get(bird_angle(vel_y))[0], (x, y))
+        lines = [f'Generation: {self._recording.generation}',
+                 f'Step: {self._step + 1} / {self._recording.n_steps}',
+                 f'Alive: {len(birds)}',
+                 f"Speed: x{SPEEDS[self._i_speed]}{'' if self._direction > 0 else ' (backward)'}"
+                 f"{'' if self._playing else ' (paused)'}"]
+        for i, line in enumerate(lines):
+            self._hud.draw_text(screen, line, 10, 10 + i * (FONT_SIZE + 2))
+        pg.display.update()
+
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        sys.exit('Usage: python replay.py <record directory> [generation]')
+    manager = SceneManager()
+    manager.switch_to(Replay(manager, sys.argv[1], int(sys.argv[2]) if len(sys.argv) == 3 else None))
+    manager.loop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,8 @@
 """
 Provide basic scene management.
 """
+import time
+
 import pygame as pg
 
 from settings import *
@@ -11,35 +13,94 @@ class SceneManager:
     Main component of a game.
     Manage multiple scenes. Each concrete scene class should be derived from the AbstractScene class.
     Provide the main loop for scene event handling, updating and drawing.
+
+    The loop runs with a fixed timestep: the scene is updated *steps_per_frame* times per rendered frame on average,
+    i.e., the simulation runs at ``render_fps * steps_per_frame`` steps per second of real time, no matter how long
+    rendering takes. If *steps_per_frame* is None, then the scene is updated as many times as possible and a frame is
+    rendered every ``1 / render_fps`` seconds. In both cases, at most a fraction *frame_budget* of each frame is spent
+    on simulation steps before the next frame is rendered, such that the game stays responsive. With a fixed number of
+    steps per frame, the rendering of up to *max_frame_skip* consecutive frames is skipped while the simulation is
+    behind, such that slow rendering does not slow down the simulation; only if it still cannot keep up, it slows
+    down instead of accumulating a backlog of steps.
     """
-    def __init__(self):
+    def __init__(self, render_fps=FPS, steps_per_frame=1, frame_budget=FRAME_BUDGET, max_frame_skip=MAX_FRAME_SKIP):
         pg.init()
         self._screen = pg.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pg.display.set_caption(TITLE)
         self.clock = pg.time.Clock()
         self.scene = None
-        self._running = True
+        self.render_fps = render_fps
+        self.steps_per_frame = steps_per_frame
+        self.frame_budget = frame_budget
+        self.max_frame_skip = max_frame_skip
+        self.running = True  # False once the game is quit
+        self._looping = False
+
+    @property
+    def screen(self):
+        return self._screen
 
     def loop(self):
-        while self._running:
+        """
+        Run the current scene until `stop` or `quit` is called.
+        """
+        self._looping = True
+        lag = 0  # simulation time (s) not yet simulated
+        last_time = time.perf_counter()
+        n_skipped = 0  # number of consecutive frames whose rendering has been skipped
+        while self._looping:
             if pg.event.get(pg.QUIT):  # if any QUIT event in the queue
                 self.quit()
-            self.scene.handle_events()
-            self.scene.update()
+                break
+            frame_time = 1 / self.render_fps
+            if n_skipped == 0:
+                self.scene.handle_events()
+            now = time.perf_counter()
+            # lag beyond the frames that can be skipped (e.g., after a pause) is dropped rather than caught up at once
+            lag = min(lag + now - last_time, (self.max_frame_skip + 1) * frame_time)
+            last_time = now
+            deadline = now + self.frame_budget * frame_time
+            if self.steps_per_frame is None:
+                while self._looping and time.perf_counter() < deadline:
+                    self.scene.update()
+            else:
+                step_time = frame_time / self.steps_per_frame
+                while self._looping and lag >= step_time and time.perf_counter() < deadline:
+                    self.scene.update()
+                    lag -= step_time
+                if self._looping and lag >= step_time and n_skipped < self.max_frame_skip:
+                    n_skipped += 1  # still behind: skip rendering this frame and simulate again
+                    continue
+            n_skipped = 0
             self.scene.draw()
-            pg.display.update()
+            if self.steps_per_frame is not None:
+                self.tick()
 
-    def swicth_to(self, scene):
+    def tick(self):
+        """
+        Wait until the next frame is due.
+        """
+        self.clock.tick(self.render_fps)
+
+    def switch_to(self, scene):
         self.scene = scene
 
+    def stop(self):
+        """
+        Leave the loop after the current simulation step, e.g., when the current scene is finished.
+        """
+        self._looping = False
+
     def quit(self):
-        self._running = False
+        self.running = False
+        self.stop()
 
 
 class AbstractScene:
     """
     Abstract scene class with the necessary handle_events, update and draw methods.
     All concrete scene classes should extend this class and implement the above three methods.
+    `handle_events` and `draw` are called once per rendered frame, while `update` performs one fixed simulation step.
     """
     def __init__(self, manager):
         self.manager = manager
@@ -51,4 +112,4 @@ class AbstractScene:
         raise NotImplementedError()
 
     def draw(self):
-        raise NotImplementedError()
\ No newline at end of file
+        raise NotImplementedError()
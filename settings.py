@@ -6,16 +6,22 @@ SCREEN_WIDTH = 600
 SCREEN_HEIGHT = 500
 TITLE = 'Flappy Bird AI via Evolutionary Cartesian Genetic Programming'
 FPS = 60
+TURBO_FPS = 10  # in turbo mode, the game runs as fast as possible and is only rendered at this frame rate
+FRAME_BUDGET = 0.8  # max fraction of each rendered frame spent on simulation steps
+MAX_FRAME_SKIP = 5  # max number of consecutive frames not rendered while the simulation is behind
 IMG_DIR = './img'
 SND_DIR = './snd'
 FONT_NAME = 'Arial'
 FONT_SIZE = 20
 WHITE = (255, 255, 255)
+N_SOUND_CHANNELS = 4  # number of mixer channels reserved for the sound effects
+SOUND_MIN_INTERVAL = 50  # min time (ms) between two plays of the same sound effect
 
 JUMP_SPEED = -3.5     # once the bird flaps, its speed becomes this value
 GRAVITY_ACC = 0.35
 BIRD_X_SPEED = 3   # the const horizontal speed of the bird
 BIRD_MAX_Y_SPEED = 5    # the maximum downward speed
+BIRD_ANGLE_STEP = 0.5  # resolution (degree) of the bird rotation
 
 # horizontal space between two adjacent pairs of pipes
 MIN_PIPE_SPACE = 165
@@ -35,9 +41,67 @@ LEVEL_BACK = 80  # how many levels back are allowed for inputs in CGP
 MU = 2
 LAMBDA = 8
 N_GEN = 50  # max number of generations
+# steady-state evolution: if True, then a bird that dies is immediately replaced by a mutated child of the MU best
+# individuals evaluated so far (see `cgp.SteadyState`), instead of waiting for all the birds of a generation to die.
+# A generation then ends once MU + LAMBDA birds have died, and the birds still flying keep flying in the next one.
+# STEADY_STATE_REPLACEMENT is either 'mu+lambda' or 'tournament' with TOURNAMENT_SIZE parents per tournament.
+STEADY_STATE = False
+STEADY_STATE_REPLACEMENT = 'mu+lambda'
+TOURNAMENT_SIZE = 2
+# budgets of the evaluation of a bird: a bird that survives MAX_EVAL_FRAMES steps, or has flown for MAX_EVAL_SECONDS
+# of wall time, is retired with a capped fitness: its score plus a tie-break in (0, 1], which is larger if the bird has
+# kept closer to the centers of the gaps (see `world.capped_fitness`). None means no limit. In the pygame game with
+# both budgets, the birds are not retired after MAX_EVAL_SECONDS: once only such birds remain, the game fast-forwards
+# them without drawing until they reach MAX_EVAL_FRAMES. Note that the fitness then depends on the machine speed.
+MAX_EVAL_FRAMES = None
+MAX_EVAL_SECONDS = None
+# in the pygame game, at most this number of alive birds are drawn. All the birds are simulated anyway.
+MAX_RENDERED_BIRDS = 200
+
+# island model (see `islands.py`): if an integer is given, then this number of populations evolve in parallel processes
+# in headless worlds. Every MIGRATION_INTERVAL generations, each island sends its best N_MIGRANTS individuals to its
+# neighbors, which are the next island ('ring') or all the other islands ('full') depending on MIGRATION_TOPOLOGY.
+N_ISLANDS = None
+MIGRATION_INTERVAL = 5
+N_MIGRANTS = 1
+MIGRATION_TOPOLOGY = 'ring'
 
 # if True, then additional information will be printed
 VERBOSE = False
+# if True, then the wall time of each phase of the game loop (CGP evaluation, update, drawing, idle time, evolution)
+# and some counters (evaluations, flaps and collisions per frame) are recorded, and a summary is printed after each
+# generation (see `profiling.py`). If PROFILE_FILE is not None, then the per-generation histograms are appended to it.
+PROFILE = False
+PROFILE_FILE = None
+# if not None, then the state of the birds and pipes in each step of the visual game is recorded into this directory,
+# one subdirectory per generation (see `recording.py`), which can be replayed by `python replay.py <directory>`
+RECORD_DIR = None
+RECORD_CHUNK_ROWS = 2 ** 16  # number of rows of each chunk file of the recorded tables
+# if not None, then a record of statistics (fitness distribution, active nodes, mutation rate, wall time, evaluations
+# per second) of each generation is appended to this JSON lines file by a background thread (see `telemetry.py`)
+TELEMETRY_FILE = None
+TELEMETRY_QUEUE_SIZE = 1000  # max number of records waiting to be written; further records are dropped
+
+# if not None, then the state of evolution is saved into this file (see `checkpoint.py`) every CHECKPOINT_INTERVAL
+# generations, and the program resumes from it on start if RESUME is True and the file exists
+CHECKPOINT_FILE = None
+CHECKPOINT_INTERVAL = 1
+RESUME = True
+
+# if True, then the birds are evaluated in a headless world (see `world.py`) without rendering or frame rate limit
+HEADLESS = False
+# If not None, then all generations are played on the same course (see `course.py`) of COURSE_LENGTH pairs of pipes,
+# either generated from a seed (int) or loaded from a .npy file (str), and all birds start from COURSE_START.
+# In the headless world, the fitness of individuals with the same active phenotype is then looked up in a cache
+# (of at most FITNESS_CACHE_SIZE entries) instead of being evaluated again.
+COURSE = None
+COURSE_LENGTH = 10000
+COURSE_START = (110, SCREEN_HEIGHT // 2)
+FITNESS_CACHE_SIZE = 1024
+# in the headless world, if an integer is given, then the birds are evaluated by this number of worker processes.
+# All birds of a generation fly on the same course (generated from a new seed in each generation unless COURSE is
+# given) from the same position, such that the results do not depend on the number of workers.
+N_WORKERS = None
 
 # Postprocessing
 # if True, then the evolved math formula will be simplified and the corresponding
@@ -45,7 +109,10 @@ VERBOSE = False
 PP_FORMULA = True
 PP_FORMULA_NUM_DIGITS = 5
 PP_FORMULA_SIMPLIFICATION = True
+PP_SIMPLIFICATION_TIMEOUT = 30  # time budget (s) of the simplification of each formula. If None, then no limit.
 PP_GRAPH_VISUALIZATION = False
+# if True, then the best individual is exported into a standalone NumPy module `pp/controller.py` (see `export.py`)
+PP_EXPORT_CONTROLLER = True
 
 # for reproduction by setting an integer value; otherwise, set `None`
 RANDOM_SEED = 14256
@@ -0,0 +1,53 @@
+"""
+Sound effects of the game.
+"""
+import glob
+import os.path
+
+import pygame as pg
+
+from settings import *
+
+
+class SoundBank:
+    """
+    All the sound effects in SND_DIR, decoded once at startup and played through a fixed set of reserved mixer
+    channels. Sounds requested during a frame are only played when `flush` is called at the end of the frame, such
+    that identical sounds triggered by many birds in the same frame are coalesced into one.
+    """
+
+    def __init__(self, n_channels=N_SOUND_CHANNELS, min_interval=SOUND_MIN_INTERVAL):
+        """
+        :param n_channels: number of mixer channels reserved for the sound effects
+        :param min_interval: min time (ms) between two plays of the same sound. More frequent requests are dropped.
+        """
+        self._sounds = {os.path.splitext(os.path.basename(file))[0]: pg.mixer.Sound(file)
+                        for file in glob.glob(os.path.join(SND_DIR, '*.wav'))}
+        pg.mixer.set_reserved(n_channels)
+        self._channels = [pg.mixer.Channel(i) for i in range(n_channels)]
+        self._i_channel = 0  # the channels are used in turn
+        self._min_interval = min_interval
+        self._last_played = {}  # name -> time (ms) when the sound was played last time
+        self._requested = {}  # names of the sounds requested in the current frame (ordered)
+
+    def play(self, name):
+        """
+        Request to play the sound *name* (the file name without extension) at the end of the current frame.
+        """
+        self._requested[name] = None
+
+    def flush(self):
+        """
+        Play the sounds requested in the current frame, each at most once.
+        """
+        if not self._requested:
+            return
+        now = pg.time.get_ticks()
+        for name in self._requested:
+            if now - self._last_played.get(name, -self._min_interval) < self._min_interval:
+                continue
+            # the oldest sound is stopped if all the channels are busy
+            self._channels[self._i_channel].play(self._sounds[name])
+            self._i_channel = (self._i_channel + 1) % len(self._channels)
+            self._last_played[name] = now
+        self._requested.clear()
@@ -1,112 +1,77 @@
 """
-Sprites used in the game: the bird and the pipe.
+Sprites used in the game: the bird and the pipe, which only draw the state of a `world.World`.
 """
-import enum
-
 import pygame as pg
 
 from settings import *
-from os import path
+from world import bird_angle
 
 
-class MovableSprite(pg.sprite.Sprite):
+class MovableSprite(pg.sprite.DirtySprite):
     def __init__(self, *groups):
         super().__init__(*groups)
         self.rect = None
+        self.dirty = 2  # it may move in any frame: always redraw it
+
+
+class RotationCache:
+    """
+    Rotated versions of a bird image for all the angles a bird may take, see `world.bird_angle`.
+    It is built once per image such that no surface is allocated when birds rotate.
+    """
+    def __init__(self, image: pg.Surface):
+        self.origin_image = image
+        n_steps = round(30 / BIRD_ANGLE_STEP)
+        self._images = {}  # angle -> (rotated image, its size)
+        for i in range(-n_steps, n_steps + 1):
+            rotated = pg.transform.rotate(image, i * BIRD_ANGLE_STEP)
+            self._images[i * BIRD_ANGLE_STEP] = rotated, rotated.get_size()
+
+    def get(self, angle):
+        """
+        :return: (rotated image, its size) for a quantized *angle* returned by `world.bird_angle`
+        """
+        return self._images[angle]
+
+
+class BirdView(MovableSprite):
+    """
+    A bird of `world.World` drawn at the position of its bounding box. It has no state of its own.
+    """
+    def __init__(self, rotations: RotationCache, layer=2):
+        self._layer = layer  # required for pygame.sprite.LayeredUpdates: set before adding it to the group!
+        super().__init__()
+        self._rotations = rotations
+        self.image = rotations.origin_image
+        self.rect = self.image.get_rect()
 
-    def moveto(self, x=0, y=0):
-        self.rect.x = x
-        self.rect.y = y
-
-    def moveby(self, dx=0, dy=0):
-        self.rect.move_ip(dx, dy)
-
-
-class Bird(MovableSprite):
-    def __init__(self, game, image: pg.Surface, x, y):
-        self._layer = 2  # required for pygame.sprite.LayeredUpdates: set before adding it to the group!
-        super().__init__(game.all_sprites, game.birds)
-        self._game = game
-        self.image = image
-        self.origin_image = self.image
-        self.rect = image.get_rect(x=x, y=y)
-        self._vel_y = 0
-        self.score = 0
-
-    def update(self, *args):
-        # check whether the bird flies outside the boundary
-        # whether it hits a pipe
-        if self.rect.top > SCREEN_HEIGHT or self.rect.bottom < 0:
-            if self._game.music_on:
-                pg.mixer.Sound(path.join(SND_DIR, 'die.wav')).play()
-            self.kill()
-            return
-        if pg.sprite.spritecollideany(self, self._game.pipes):
-            if self._game.music_on:
-                pg.mixer.Sound(path.join(SND_DIR, 'hit.wav')).play()
-            self.kill()
-            return
-        self._vel_y = min(self._vel_y + GRAVITY_ACC, BIRD_MAX_Y_SPEED)
-        self.rect.y += self._vel_y
-        # rotate the bird according to how it is moving: [-4, 4] -> 40 degree
-        angle = 40 - (self._vel_y + 4) / 8 * 80
-        angle = min(30, max(angle, -30))
-        self.image = pg.transform.rotate(self.origin_image, angle)
-        self.rect = self.image.get_rect(center=self.rect.center)
-
-    def flap(self):
-        self._vel_y = JUMP_SPEED
-        if self._game.music_on:
-            pg.mixer.Sound(path.join(SND_DIR, 'wing.wav')).play()
-
-    @property
-    def vel_y(self):
-        return self._vel_y
-
-
-class AIBird(Bird):
-    def __init__(self, game, image: pg.Surface, x, y, brain):
-        super().__init__(game, image, x, y)
-        self.brain = brain
-
-    def kill(self):
-        super().kill()
-        self.brain.fitness = self.score
-
-    def eval(self, v, h, g):
-        return self.brain.eval(v, h, g)
-
-
-class PipeType(enum.Enum):
-    TOP = 0
-    BOTTOM = 1
+    def show(self, x, y, vel_y):
+        """
+        Show the bird at (x, y) rotated according to its speed *vel_y*.
+        """
+        self.image, self.rect.size = self._rotations.get(bird_angle(vel_y))
+        self.rect.topleft = x, y
 
 
 class Pipe(MovableSprite):
-    def __init__(self, game, image, centerx, length, type_):
+    """
+    A view of a `world.SimPipe`.
+    """
+    def __init__(self, game, image, pipe):
         self._layer = 1
-        super().__init__(game.all_sprites, game.pipes)
-        self._game = game
-        self.type = type_
-        # crop the image to the specified length
-        self.image = pg.Surface((image.get_width(), length))
-        if type_ == PipeType.TOP:
-            self.image.blit(image, (0, 0), (0, image.get_height() - length, image.get_width(), length))
-        else:
-            self.image.blit(image, (0, 0), (0, 0, image.get_width(), length))
-        # position and region
-        self.rect = self.image.get_rect(centerx=centerx)
-        if type_ == PipeType.TOP:
-            self.rect.top = 0
+        super().__init__(game.all_sprites)
+        # crop the image to the length of the pipe
+        self.image = pg.Surface((image.get_width(), pipe.length))
+        if pipe.is_top:
+            self.image.blit(image, (0, 0), (0, image.get_height() - pipe.length, image.get_width(), pipe.length))
         else:
-            self.rect.bottom = SCREEN_HEIGHT
-        self.gap = 0
-        self.length = length
+            self.image.blit(image, (0, 0), (0, 0, image.get_width(), pipe.length))
+        self.rect = self.image.get_rect(x=pipe.x, y=pipe.y)
 
 
-class Background(pg.sprite.Sprite):
+class Background(pg.sprite.DirtySprite):
     """
-    Seamless background class.
+    Seamless background class. It is static and only redrawn where other sprites have changed.
     """
     def __init__(self, game, image):
         self._layer = 0
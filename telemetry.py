@@ -0,0 +1,111 @@
+"""
+Telemetry of evolution.
+
+One record of statistics is made per generation: the fitness distribution, the sizes of the active graphs, the
+mutation rate, the wall time and the evaluation throughput. The records are appended to a JSON lines file by a
+background thread. The game loop only puts them into a bounded queue without waiting: if the writer cannot keep up,
+records are dropped (and counted) rather than stalling the game.
+"""
+import json
+import queue
+import threading
+import time
+
+import numpy as np
+
+from settings import *
+
+FITNESS_QUANTILES = [0, 10, 25, 50, 75, 90, 100]
+
+
+class TelemetryWriter(threading.Thread):
+    """
+    A background thread appending the records from a bounded queue to a JSON lines file.
+    """
+    _STOP = object()
+
+    def __init__(self, file, max_queue_size=TELEMETRY_QUEUE_SIZE):
+        super().__init__(name='telemetry-writer', daemon=True)
+        self._file = open(file, 'a')  # opened here such that an invalid path fails immediately
+        self._queue = queue.Queue(max_queue_size)
+        self.n_dropped = 0
+
+    def put(self, record):
+        """
+        Queue a record (a JSON-serializable dict) without blocking.
+        :return: False if the queue is full and the record is dropped
+        """
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.n_dropped += 1
+            return False
+
+    def run(self):
+        with self._file as f:
+            while True:
+                record = self._queue.get()
+                if record is self._STOP:
+                    break
+                f.write(json.dumps(record) + '\n')
+                if self._queue.empty():
+                    f.flush()
+
+    def close(self):
+        """
+        Write the queued records and stop the thread.
+        """
+        self._queue.put(self._STOP)
+        self.join()
+
+
+def _n_active_nodes(ind):
+    if not ind._active_determined:
+        ind._determine_active_nodes()
+        ind._active_determined = True
+    return int(np.count_nonzero(ind.active))
+
+
+class Telemetry:
+    """
+    Make one record per generation of a game and send it to a `TelemetryWriter`.
+    """
+
+    def __init__(self, file=TELEMETRY_FILE, max_queue_size=TELEMETRY_QUEUE_SIZE):
+        self._writer = TelemetryWriter(file, max_queue_size)
+        self._writer.start()
+        self._start_time = None
+
+    def begin_generation(self):
+        self._start_time = time.perf_counter()
+
+    def end_generation(self, game, mutation_rate):
+        """
+        Record the generation of *game* that has just been evaluated, before its population evolves.
+        :param mutation_rate: the mutation rate used to create the next generation
+        """
+        wall_time = time.perf_counter() - self._start_time
+        fitness = np.array([ind.fitness for ind in game.pop if ind.fitness is not None], dtype=float)
+        n_active = np.array([_n_active_nodes(ind) for ind in game.pop])
+        best = max((ind for ind in game.pop if ind.fitness is not None), key=lambda ind: ind.fitness)
+        self._writer.put({
+            'generation': game.current_generation,
+            'time': time.time(),
+            'wall_time': wall_time,
+            'population_size': len(game.pop),
+            'max_fitness': fitness.max().item(),
+            'mean_fitness': fitness.mean().item(),
+            'fitness_std': fitness.std().item(),
+            'fitness_quantiles': dict(zip(FITNESS_QUANTILES, np.percentile(fitness, FITNESS_QUANTILES).tolist())),
+            'max_score_so_far': game._max_score_so_far,
+            'active_nodes': {'mean': n_active.mean().item(), 'min': n_active.min().item(),
+                             'max': n_active.max().item(), 'best': _n_active_nodes(best)},
+            'mutation_rate': mutation_rate,
+            'n_evals': game.n_evals,
+            'evals_per_second': game.n_evals / wall_time if wall_time > 0 else None,
+            'n_dropped': self._writer.n_dropped,  # records dropped so far because the queue was full
+        })
+
+    def close(self):
+        self._writer.close()
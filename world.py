@@ -0,0 +1,928 @@
+"""
+Headless simulation of the flappy bird world.
+
+The world implements the physics and rules of the game without pygame: `game.Game` renders a world with sprites,
+while `HeadlessGame` runs it without rendering or frame rate limit. Thus, fitness evaluation in `cgp.evolve` can run
+as fast as the CPU allows, even on a server without any display.
+"""
+import bisect
+import functools
+import itertools
+import math
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import cgp
+from course import PIPE_WIDTH, get_course, image_size, next_pipe, pipe_at
+from settings import *
+
+BIRD_WIDTH, BIRD_HEIGHT = image_size('bird.png')
+# a world with at most this number of alive birds steps them one by one with Python scalars, which is faster than the
+# fixed cost of the whole-array operations for a few birds, e.g., the MU + LAMBDA birds of the default settings
+SCALAR_MAX_BIRDS = 32
+# shared results of the steps in which no bird is killed or retired, which are never modified
+_NO_IDS = np.empty(0, dtype=np.intp)
+_NO_IDS.flags.writeable = False
+_NO_FLAGS = np.empty(0, dtype=bool)
+_NO_FLAGS.flags.writeable = False
+
+
+def round_coord(value):
+    """
+    Round a float coordinate like pygame does when it is assigned to a `pygame.Rect` (half away from zero).
+    """
+    if value >= 0:
+        return int(math.floor(value + 0.5))
+    return -int(math.floor(-value + 0.5))
+
+
+def round_coords(values):
+    """
+    Vectorized `round_coord`.
+    :return: an int64 array
+    """
+    return np.where(values >= 0, np.floor(values + 0.5), -np.floor(-values + 0.5)).astype(np.int64)
+
+
+def bird_angle(vel_y):
+    """
+    Rotation angle (degree) of a bird according to how it is moving: [-4, 4] -> 40 degree.
+    The angle is a multiple of BIRD_ANGLE_STEP such that the rotated images can be cached, see `sprites.RotationCache`.
+    """
+    angle = 40 - (vel_y + 4) / 8 * 80
+    angle = min(30, max(angle, -30))
+    return round(angle / BIRD_ANGLE_STEP) * BIRD_ANGLE_STEP
+
+
+@functools.lru_cache(maxsize=None)
+def rotated_size(width, height, angle):
+    """
+    Size of the bounding box of a *width* x *height* image rotated by *angle* degrees,
+    identical to the size of the surface returned by `pygame.transform.rotate`.
+    """
+    rad = angle * .01745329251994329
+    s = math.sin(rad)
+    c = math.cos(rad)
+    cx, cy = c * width, c * height
+    sx, sy = s * width, s * height
+    new_width = int(max(abs(cx + sy), abs(cx - sy), abs(-cx + sy), abs(-cx - sy)))
+    new_height = int(max(abs(sx + cy), abs(sx - cy), abs(-sx + cy), abs(-sx - cy)))
+    return new_width, new_height
+
+
+def _rotated_bird_sizes():
+    """
+    Sizes of the rotated bird for all the angles returned by `bird_angle`, i.e., k * BIRD_ANGLE_STEP for k in
+    [-n_steps, n_steps].
+    :return: (n_steps, widths, heights), where element n_steps + k of the arrays is the size for angle k
+    """
+    n_steps = round(30 / BIRD_ANGLE_STEP)
+    sizes = [rotated_size(BIRD_WIDTH, BIRD_HEIGHT, k * BIRD_ANGLE_STEP) for k in range(-n_steps, n_steps + 1)]
+    widths, heights = np.array(sizes, dtype=np.int64).T
+    return n_steps, widths, heights
+
+
+_ROTATED_BIRD_SIZES = _rotated_bird_sizes()
+
+
+@functools.lru_cache(maxsize=1024)
+def rotated_bird_size(vel_y):
+    """
+    ``rotated_size(BIRD_WIDTH, BIRD_HEIGHT, bird_angle(vel_y))`` cached by speed: the speed of a bird only takes a few
+    values, since it changes by GRAVITY_ACC in each step from 0 or JUMP_SPEED up to BIRD_MAX_Y_SPEED.
+    """
+    return rotated_size(BIRD_WIDTH, BIRD_HEIGHT, bird_angle(vel_y))
+
+
+def rotated_sizes(vel_y):
+    """
+    Vectorized ``rotated_size(BIRD_WIDTH, BIRD_HEIGHT, bird_angle(vel_y))``.
+    :return: (widths, heights)
+    """
+    n_steps, widths, heights = _ROTATED_BIRD_SIZES
+    angle = np.minimum(np.maximum(40 - (vel_y + 4) / 8 * 80, -30), 30)
+    # np.round rounds half to even like the built-in round
+    k = np.round(angle / BIRD_ANGLE_STEP).astype(np.intp) + n_steps
+    return widths[k], heights[k]
+
+
+def adaptive_mutation_rate(max_score):
+    """
+    Mutation rate for the next generation: if current score is very low, then we use a large mutation rate.
+    """
+    if max_score < 500:
+        return MUT_PB * 3
+    if max_score < 1000:
+        return MUT_PB * 2
+    if max_score < 2000:
+        return MUT_PB * 1.5
+    if max_score < 5000:
+        return MUT_PB * 1.2
+    return MUT_PB
+
+
+def capped_fitness(score, mean_gap_distance):
+    """
+    Fitness of a bird retired once its evaluation budget is exhausted (see MAX_EVAL_FRAMES and MAX_EVAL_SECONDS).
+    The birds that survive the same budget are ranked by how close they have kept to the centers of the gaps.
+
+    :param score: the score of the bird when retired
+    :param mean_gap_distance: mean vertical distance between the centers of the bird and of the gap in its front
+    :return: *score* plus a tie-break in (0, 1]
+    """
+    return score + 1 / (1 + mean_gap_distance)
+
+
+class SimRect:
+    """
+    An axis-aligned rectangle with integer coordinates, a lightweight counterpart of `pygame.Rect`.
+    """
+    __slots__ = ('x', 'y', 'w', 'h')
+
+    def __init__(self, x, y, w, h):
+        self.x = x
+        self.y = y
+        self.w = w
+        self.h = h
+
+    @property
+    def right(self):
+        return self.x + self.w
+
+    @property
+    def bottom(self):
+        return self.y + self.h
+
+    def colliderect(self, other):
+        if self.w == 0 or self.h == 0 or other.w == 0 or other.h == 0:
+            return False
+        return (self.x < other.x + other.w and self.y < other.y + other.h and
+                self.x + self.w > other.x and self.y + self.h > other.y)
+
+
+class SimPipe(SimRect):
+    """
+    A top or a bottom pipe.
+    """
+    __slots__ = ('is_top', 'gap', 'length')
+
+    def __init__(self, centerx, length, is_top, gap):
+        super().__init__(centerx - PIPE_WIDTH // 2, 0 if is_top else SCREEN_HEIGHT - length, PIPE_WIDTH, length)
+        self.is_top = is_top
+        self.gap = gap
+        self.length = length
+
+
+class _AliveBirdArray:
+    """
+    An array of the alive birds of a `World`. While the birds are stepped one by one (see SCALAR_MAX_BIRDS), the arrays
+    are replaced by Python lists, which are only converted back into arrays once any of them is accessed.
+    """
+
+    def __init__(self, dtype):
+        self.dtype = dtype
+
+    def __set_name__(self, owner, name):
+        self.name = '_' + name
+
+    def __get__(self, world, owner=None):
+        if world is None:
+            return self
+        if world._bird_lists is not None:
+            world._store_bird_lists()
+        return world.__dict__[self.name]
+
+    def __set__(self, world, value):
+        if world._bird_lists is not None:
+            world._store_bird_lists()
+        world.__dict__[self.name] = value
+
+
+class World:
+    """
+    A headless flappy bird world. Birds controlled by CGP individuals fly through randomly generated pipes.
+    One call of `step` corresponds to one simulation step of `game.Game`, which renders a world of this class.
+
+    The state of the birds is kept in arrays (struct of arrays) instead of one object per bird. The alive birds are
+    packed into the arrays `ids` (index of each bird in the round), `x`, `y`, `w`, `h` (bounding box) and `vel_y`,
+    which are compacted when birds die (the ids are not sorted once birds have been respawned), while `alive`, `score`,
+    `gap_distance` and `start_time` have one element for each bird of the round.
+    Each step moves, kills and scores all the birds with whole-array operations, and only the brains are evaluated
+    one by one, unless there are at most SCALAR_MAX_BIRDS alive birds: then they are moved and killed one by one with
+    the same results, and `x`, `y`, `w`, `h` and `vel_y` are kept as lists between the steps (see `_load_bird_lists`).
+    """
+    x = _AliveBirdArray(np.int64)
+    y = _AliveBirdArray(np.int64)
+    w = _AliveBirdArray(np.int64)
+    h = _AliveBirdArray(np.int64)
+    vel_y = _AliveBirdArray(np.float64)
+    _BIRD_ARRAYS = (x, y, w, h, vel_y)
+
+    def __init__(self, rng=random, course=None, max_frames=MAX_EVAL_FRAMES, max_seconds=MAX_EVAL_SECONDS):
+        """
+        :param rng: random number generator for bird positions and pipes. The global `random` module is used by
+            default such that the random numbers are consumed in the same order in any world.
+        :param course: if not None, every round is played on this course (see `course.py`) and all birds start from
+            COURSE_START, such that the score of a bird only depends on its brain.
+        :param max_frames: if not None, a bird with a brain is retired with a capped fitness (see `capped_fitness`)
+            once it has survived this number of steps
+        :param max_seconds: if not None, a bird with a brain is retired with a capped fitness once it has flown for
+            this wall time in seconds
+        """
+        self.rng = rng
+        self.course = course
+        self.max_frames = max_frames
+        self.max_seconds = max_seconds
+        self._course_index = 0  # index of the next pair of pipes in the course
+        self.brains = []  # the CGP individual of each bird, None for a bird flapped by `flap` (the human player)
+        self.alive = np.empty(0, dtype=bool)
+        self.score = np.empty(0, dtype=np.int64)
+        self.gap_distance = np.empty(0)  # sum of the distances to the gap centers of each bird, if budgeted
+        self.start_time = np.empty(0)  # wall time when each bird started flying
+        self.ids = np.empty(0, dtype=np.intp)
+        self._bird_lists = None  # [x, y, w, h, vel_y] as lists instead of the arrays, see `_load_bird_lists`
+        self.x = self.y = self.w = self.h = np.empty(0, dtype=np.int64)
+        self.vel_y = np.empty(0)
+        self._inputs = np.empty((0, 3), dtype=np.int64)  # see `inputs`
+        self.crashed = np.empty(0, dtype=np.intp)  # ids of the birds killed in the last step
+        self.crashed_outside = np.empty(0, dtype=bool)  # whether each of them flew outside the boundary
+        self.capped = np.empty(0, dtype=np.intp)  # ids of the birds retired in the last step (see `retire_birds`)
+        self._evaluated = []  # (position in the alive arrays, brain) of the alive birds with a brain
+        self.pipes = []
+        self.max_score = 0  # number of steps survived by the best bird in this round
+        self.n_evals = 0  # number of CGP evaluations in this round
+        self._front_pipe = None  # the (top) pipe in the most front
+        # (right edge + self._scroll, bottom pipe, top pipe) of the pipe columns ordered by x, where self._scroll is the
+        # total distance the pipes have moved backwards in this round, such that the key of each column never changes
+        self._bottom_pipes = deque()
+        self._scroll = 0
+        # arrays of the (right edge + self._scroll, bottom of the top pipe, top of the bottom pipe, gap) of the columns
+        self._columns = np.empty((4, 0), dtype=np.int64)
+        # the same columns as a list of keys and a list of rows for the birds stepped one by one
+        self._column_keys = []
+        self._column_rows = []
+        self._min_pipe_space = MIN_PIPE_SPACE
+        self._min_pipe_gap = MIN_PIPE_GAP
+        self._scalar_max_birds = SCALAR_MAX_BIRDS
+
+    @property
+    def n_alive(self):
+        return len(self.ids)
+
+    def _load_bird_lists(self):
+        """
+        Convert the arrays x, y, w, h and vel_y of the alive birds into lists to step the birds one by one. The lists
+        replace the arrays until any of these arrays is accessed, such that they are not converted in every step.
+        :return: the lists [x, y, w, h, vel_y], which may be modified in place
+        """
+        if self._bird_lists is None:
+            self._bird_lists = [self.__dict__[a.name].tolist() for a in self._BIRD_ARRAYS]
+        return self._bird_lists
+
+    def _store_bird_lists(self):
+        """
+        Convert the lists of `_load_bird_lists` back into the arrays.
+        """
+        lists, self._bird_lists = self._bird_lists, None
+        for a, values in zip(self._BIRD_ARRAYS, lists):
+            self.__dict__[a.name] = np.array(values, dtype=a.dtype)
+
+    @property
+    def inputs(self):
+        """
+        The inputs (v, h, g) of the alive birds in the last `flap_birds`, an int64 array of shape (n_alive, 3).
+        """
+        if not isinstance(self._inputs, np.ndarray):  # a list of tuples if the birds have been evaluated one by one
+            self._inputs = np.array(self._inputs, dtype=np.int64).reshape(-1, 3)
+        return self._inputs
+
+    def reset(self, brains):
+        """
+        Start a new round with one bird for each CGP individual in *brains*.
+        """
+        self.max_score = 0
+        self.n_evals = 0
+        self.pipes = []
+        self._bottom_pipes.clear()
+        self._scroll = 0
+        n = len(brains)
+        if self.course is not None:
+            self._course_index = 0
+            self.x, self.y = (np.full(n, value, dtype=np.int64) for value in COURSE_START)
+        else:
+            positions = [(self.rng.randint(20, 200), self.rng.randint(SCREEN_HEIGHT // 4, SCREEN_HEIGHT // 4 * 3))
+                         for _ in range(n)]
+            self.x, self.y = np.array(positions, dtype=np.int64).reshape(n, 2).T.copy()
+        self.brains = list(brains)
+        self.alive = np.ones(n, dtype=bool)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.gap_distance = np.zeros(n)
+        self.start_time = np.full(n, time.perf_counter())
+        self.ids = np.arange(n)
+        self.w = np.full(n, BIRD_WIDTH, dtype=np.int64)
+        self.h = np.full(n, BIRD_HEIGHT, dtype=np.int64)
+        self.vel_y = np.zeros(n)
+        self.crashed = _NO_IDS
+        self.crashed_outside = _NO_FLAGS
+        self.capped = _NO_IDS
+        self._update_evaluated()
+        self._spawn_pipe(80)  # the first pipe with x as the baseline
+        while self._front_pipe.x < SCREEN_WIDTH:
+            self._spawn_pipe()
+        self._update_columns()
+
+    def add_bird(self, x, y):
+        """
+        Add a bird without a brain, which only flaps when `flap` is called, e.g., by a human player.
+        :return: the id of the bird
+        """
+        self.brains.append(None)
+        self.alive = np.append(self.alive, True)
+        self.score = np.append(self.score, 0)
+        self.gap_distance = np.append(self.gap_distance, 0.)
+        self.start_time = np.append(self.start_time, time.perf_counter())
+        self.ids = np.append(self.ids, len(self.brains) - 1)
+        self.x = np.append(self.x, x)
+        self.y = np.append(self.y, y)
+        self.w = np.append(self.w, BIRD_WIDTH)
+        self.h = np.append(self.h, BIRD_HEIGHT)
+        self.vel_y = np.append(self.vel_y, 0.)
+        self._update_evaluated()
+        return self.ids[-1]
+
+    def respawn(self, ids, brains):
+        """
+        Replace the dead birds *ids* by new birds with *brains*, e.g., in steady-state evolution. A new bird starts
+        from a random x like in `reset` and vertically in the middle of the gap of its front pipes, such that it is not
+        inside a pipe.
+        """
+        n = len(ids)
+        if not n:
+            return
+        if self.course is not None:
+            x = np.full(n, COURSE_START[0], dtype=np.int64)
+        else:
+            x = np.array([self.rng.randint(20, 200) for _ in range(n)], dtype=np.int64)
+        _, _, bottom_top, gap = self._columns[:, np.searchsorted(self._columns[0], x + self._scroll)]
+        for id_, brain in zip(ids, brains):
+            self.brains[id_] = brain
+        ids = np.asarray(ids, dtype=np.intp)
+        self.alive[ids] = True
+        self.score[ids] = 0
+        self.gap_distance[ids] = 0
+        self.start_time[ids] = time.perf_counter()
+        self.ids = np.concatenate([self.ids, ids])
+        self.x = np.concatenate([self.x, x])
+        self.y = np.concatenate([self.y, bottom_top - gap // 2 - BIRD_HEIGHT // 2])
+        self.w = np.concatenate([self.w, np.full(n, BIRD_WIDTH, dtype=np.int64)])
+        self.h = np.concatenate([self.h, np.full(n, BIRD_HEIGHT, dtype=np.int64)])
+        self.vel_y = np.concatenate([self.vel_y, np.zeros(n)])
+        self._update_evaluated()
+
+    def position(self, id_):
+        """
+        :return: the position of the alive bird *id_* in the arrays of the alive birds
+        """
+        return np.flatnonzero(self.ids == id_)[0]
+
+    def flap(self, id_):
+        """
+        Flap the alive bird *id_*.
+        """
+        self.vel_y[self.position(id_)] = JUMP_SPEED
+
+    def _update_evaluated(self):
+        brains = self.brains
+        self._evaluated = [(i, brains[id_]) for i, id_ in enumerate(self.ids.tolist()) if brains[id_] is not None]
+
+    def _spawn_pipe(self, front_x=None):
+        if front_x is None:
+            front_x = self._front_pipe.x
+        if self.course is not None:
+            centerx, gap, top_length, bottom_length = pipe_at(self.course, self._course_index, front_x)
+            self._course_index += 1
+        else:
+            front_length = self._front_pipe.length if self._front_pipe is not None else None
+            centerx, gap, top_length, bottom_length = next_pipe(self.rng, front_x, front_length,
+                                                                self._min_pipe_space, self._min_pipe_gap)
+        top_pipe = SimPipe(centerx, top_length, True, gap)
+        bottom_pipe = SimPipe(centerx, bottom_length, False, gap)
+        self.pipes.append(top_pipe)
+        self.pipes.append(bottom_pipe)
+        self._front_pipe = top_pipe
+        self._bottom_pipes.append((bottom_pipe.right + self._scroll, bottom_pipe, top_pipe))
+
+    def _update_columns(self):
+        """
+        Update the arrays of the pipe columns after a column has been spawned or removed.
+        """
+        self._column_rows = [(key, top.bottom, bottom.y, bottom.gap) for key, bottom, top in self._bottom_pipes]
+        self._column_keys = [row[0] for row in self._column_rows]
+        self._columns = np.array(self._column_rows, dtype=np.int64).T
+
+    def flap_birds(self):
+        """
+        Let each bird with a brain decide whether to flap according to the three inputs: v, h, g.
+        :return: the number of birds evaluated and the number of flaps
+        """
+        one_by_one = len(self.ids) <= self._scalar_max_birds
+        if one_by_one:
+            self._inputs = inputs = self._bird_inputs()
+        else:
+            # the front column of a bird is the first one whose right edge is not behind it
+            right, _, bottom_top, gap = self._columns[:, np.searchsorted(self._columns[0], self.x + self._scroll)]
+            self._inputs = np.column_stack([bottom_top - self.y, right - PIPE_WIDTH - self._scroll - self.x, gap])
+            inputs = self._inputs.tolist()
+        # the compiled function of each brain is faster than `cgp.eval_population` on different individuals, which
+        # computes all their nodes instead of the active ones only
+        flaps = [i for i, brain in self._evaluated if brain.eval(*inputs[i]) > 0]
+        if one_by_one:
+            vel_y = self._load_bird_lists()[4]
+            for i in flaps:
+                vel_y[i] = JUMP_SPEED
+        elif flaps:
+            self.vel_y[flaps] = JUMP_SPEED
+        self.n_evals += len(self._evaluated)
+        if self.max_frames is not None or self.max_seconds is not None:
+            # for the tie-break of capped birds: the center of the gap is (gap + h) / 2 above the top of a bird
+            if one_by_one:
+                distances = [abs(v - (g + h) / 2) for (v, _, g), h in zip(inputs, self._load_bird_lists()[3])]
+            else:
+                distances = np.abs(self._inputs[:, 0] - (self._inputs[:, 2] + self.h) / 2)
+            self.gap_distance[self.ids] += distances
+        return len(self._evaluated), len(flaps)
+
+    def _bird_inputs(self):
+        """
+        The inputs (v, h, g) of each alive bird computed one by one, see `flap_birds`.
+        :return: a list of tuples
+        """
+        keys, rows, scroll = self._column_keys, self._column_rows, self._scroll
+        xs, ys, _, _, _ = self._load_bird_lists()
+        inputs = []
+        for x, y in zip(xs, ys):
+            right, _, bottom_top, gap = rows[bisect.bisect_left(keys, x + scroll)]
+            inputs.append((bottom_top - y, right - PIPE_WIDTH - scroll - x, gap))
+        return inputs
+
+    def flapped(self):
+        """
+        :return: whether each alive bird has flapped in this step, before `update` is called
+        """
+        # the speed of a bird is JUMP_SPEED iff it has just flapped, since gravity always applies
+        return self.vel_y == JUMP_SPEED
+
+    def kill_crashed_birds(self):
+        """
+        Kill all the birds that fly outside the boundary or hit a pipe at once.
+        Each bird is tested against the pipe column in its front and the next one, which are the only pipes it
+        may overlap with, using the same hitbox semantics as `pygame.Rect.colliderect`.
+        :return: the number of killed birds
+        """
+        if len(self.ids) <= self._scalar_max_birds:
+            positions, outside = self._find_crashed_birds()
+            if not positions:
+                self.crashed, self.crashed_outside = _NO_IDS, _NO_FLAGS
+                return 0
+            crashed = np.zeros(len(self.ids), dtype=bool)
+            crashed[positions] = True
+            outside = np.array(outside)
+        else:
+            x, y, w, h = self.x + self._scroll, self.y, self.w, self.h  # the columns are offset by the scroll distance
+            bottom = y + h
+            outside = (y > SCREEN_HEIGHT) | (bottom < 0)
+            i_front = np.searchsorted(self._columns[0], x)
+            # the front column and the next one of each bird in rows 0 and 1
+            i_columns = np.minimum([i_front, i_front + 1], self._columns.shape[1] - 1)
+            right, top_bottom, bottom_top, _ = self._columns[:, i_columns]
+            in_column = (x < right) & (x + w > right - PIPE_WIDTH)
+            hit = in_column & (((y < top_bottom) & (bottom > 0)) | ((y < SCREEN_HEIGHT) & (bottom > bottom_top)))
+            crashed = outside | hit[0] | hit[1]
+            outside = outside[crashed]
+        self.crashed = self.ids[crashed]
+        self.crashed_outside = outside
+        if len(self.crashed):
+            self.alive[self.crashed] = False
+            for id_, score in zip(self.crashed.tolist(), self.score[self.crashed].tolist()):
+                if self.brains[id_] is not None:
+                    self.brains[id_].fitness = score
+            self._keep(~crashed)
+        return len(self.crashed)
+
+    def _find_crashed_birds(self):
+        """
+        The collision test of `kill_crashed_birds` for the alive birds one by one.
+        :return: (positions of the crashed birds in the alive arrays, whether each of them flew outside the boundary)
+        """
+        keys, rows, scroll = self._column_keys, self._column_rows, self._scroll
+        xs, ys, ws, hs, _ = self._load_bird_lists()
+        positions, outside = [], []
+        for i, (x, y, w, h) in enumerate(zip(xs, ys, ws, hs)):
+            bottom = y + h
+            if y > SCREEN_HEIGHT or bottom < 0:
+                positions.append(i)
+                outside.append(True)
+                continue
+            x += scroll
+            # the front column and the next one if any, like the clipped indices of the whole-array test
+            i_front = bisect.bisect_left(keys, x)
+            for right, top_bottom, bottom_top, _ in rows[i_front:i_front + 2]:
+                if x < right and x + w > right - PIPE_WIDTH and (
+                        (y < top_bottom and bottom > 0) or (y < SCREEN_HEIGHT and bottom > bottom_top)):
+                    positions.append(i)
+                    outside.append(False)
+                    break
+        return positions, outside
+
+    def _keep(self, kept):
+        """
+        Compact the arrays of the alive birds to the birds selected by the boolean array *kept*.
+        """
+        self.ids, self.x, self.y, self.w, self.h, self.vel_y = (
+            a[kept] for a in (self.ids, self.x, self.y, self.w, self.h, self.vel_y))
+        self._update_evaluated()
+
+    def evaluation_time(self):
+        """
+        :return: the wall time in seconds for which each alive bird has flown
+        """
+        return time.perf_counter() - self.start_time[self.ids]
+
+    def retire_birds(self, retired):
+        """
+        Remove the alive birds selected by the boolean array *retired*, whose evaluation budget is exhausted, and set
+        the fitness of their brains to a capped fitness (see `capped_fitness`). Unlike crashed birds, they are listed
+        in `capped`.
+        """
+        ids = self.ids[retired]
+        self.alive[ids] = False
+        scores = self.score[ids]
+        fitness = capped_fitness(scores, self.gap_distance[ids] / np.maximum(scores, 1))
+        for id_, value in zip(ids.tolist(), fitness.tolist()):
+            if self.brains[id_] is not None:
+                self.brains[id_].fitness = value
+        self.capped = np.concatenate([self.capped, ids])
+        self._keep(~retired)
+
+    def _retire_over_budget(self):
+        """
+        Retire the birds with a brain that have survived `max_frames` steps or flown for `max_seconds`.
+        """
+        over = np.zeros(len(self.ids), dtype=bool)
+        if self.max_frames is not None:
+            over |= self.score[self.ids] >= self.max_frames
+        if self.max_seconds is not None:
+            over |= self.evaluation_time() > self.max_seconds
+        if over.any():
+            brains = self.brains
+            over &= np.array([brains[id_] is not None for id_ in self.ids.tolist()])
+            self.retire_birds(over)
+
+    def update(self):
+        """
+        Kill the crashed birds and move the others after they have decided whether to flap. Then the birds whose
+        evaluation budget is exhausted are retired.
+        :return: whether any bird is still alive
+        """
+        self.capped = _NO_IDS
+        self.kill_crashed_birds()
+        if not len(self.ids):
+            return False
+        # move the birds under gravity and rotate them around their centers, and forwards until one of them reaches
+        # the first third of the screen
+        if len(self.ids) <= self._scalar_max_birds:
+            forwards = self._move_birds()
+        else:
+            self.vel_y = np.minimum(self.vel_y + GRAVITY_ACC, BIRD_MAX_Y_SPEED)
+            centerx = self.x + self.w // 2
+            centery = round_coords(self.y + self.vel_y) + self.h // 2
+            self.w, self.h = rotated_sizes(self.vel_y)
+            self.x = centerx - self.w // 2
+            self.y = centery - self.h // 2
+            forwards = self.x.max() < SCREEN_WIDTH / 3
+            if forwards:
+                self.x += BIRD_X_SPEED
+        # otherwise, move the pipes backwards such that birds seem to fly
+        if not forwards:
+            for pipe in self.pipes:
+                pipe.x -= BIRD_X_SPEED
+            self.pipes = [p for p in self.pipes if p.x >= -50]
+            self._scroll += BIRD_X_SPEED
+            if self._bottom_pipes[0][1].x < -50:
+                while self._bottom_pipes[0][1].x < -50:
+                    self._bottom_pipes.popleft()
+                self._update_columns()
+        # count the score: one point per step
+        self.score[self.ids] += 1
+        self.max_score += 1
+        if self.max_frames is not None or self.max_seconds is not None:
+            self._retire_over_budget()
+        # spawn a new pipe if necessary
+        if self._front_pipe.x < SCREEN_WIDTH:
+            while self._front_pipe.x < SCREEN_WIDTH:
+                self._spawn_pipe()
+            self._update_columns()
+        return len(self.ids) > 0
+
+    def _move_birds(self):
+        """
+        The move of the alive birds in `update` one by one.
+        :return: whether the birds have moved forwards
+        """
+        x, y, w, h, vel_y = [], [], [], [], []
+        for x0, y0, w0, h0, v in zip(*self._load_bird_lists()):
+            v = min(v + GRAVITY_ACC, BIRD_MAX_Y_SPEED)
+            w1, h1 = rotated_bird_size(v)
+            x.append(x0 + w0 // 2 - w1 // 2)
+            y.append(round_coord(y0 + v) + h0 // 2 - h1 // 2)
+            w.append(w1)
+            h.append(h1)
+            vel_y.append(v)
+        forwards = max(x) < SCREEN_WIDTH / 3
+        if forwards:
+            x = [x0 + BIRD_X_SPEED for x0 in x]
+        self._bird_lists = [x, y, w, h, vel_y]
+        return forwards
+
+    def step(self):
+        """
+        Advance the world by one simulation step.
+        :return: whether any bird is still alive
+        """
+        self.flap_birds()
+        return self.update()
+
+    def run(self):
+        """
+        Run the current round until all birds die.
+        :return: the score of the best bird
+        """
+        while self.step():
+            pass
+        return self.max_score
+
+
+def refill_slots(world, steady_state, pop, mut_rate):
+    """
+    Steady-state evolution: insert the individuals of the AI birds killed or retired in the last step of *world* into
+    the pool of *steady_state* (see `cgp.SteadyState`) and replace each of them by a child, both in *pop* and in the
+    world. The id of a bird is its index in *pop*.
+
+    :return: the number of individuals evaluated
+    """
+    ids = [id_ for id_ in np.concatenate([world.crashed, world.capped]).tolist() if world.brains[id_] is not None]
+    for id_ in ids:
+        steady_state.insert(world.brains[id_])
+    children = [steady_state.child(mut_rate) for _ in ids]
+    for id_, child in zip(ids, children):
+        pop[id_] = child
+    world.respawn(ids, children)
+    return len(ids)
+
+
+def score_flying_birds(world):
+    """
+    Set the fitness of the brain of each alive bird of *world* to its score so far, a lower bound of its final
+    fitness, e.g., at the end of a generation in steady-state evolution while the birds keep flying.
+    """
+    for id_, score in zip(world.ids.tolist(), world.score[world.ids].tolist()):
+        if world.brains[id_] is not None:
+            world.brains[id_].fitness = score
+
+
+def evaluate_genomes(course_spec, genomes):
+    """
+    Fly the birds whose brains are given by the serialized *genomes* (see `cgp.Individual.to_bytes`) on the course
+    specified by *course_spec* (see `course.get_course`). Since birds on the same course do not interact with each
+    other, the scores do not depend on which birds fly together. This function is run by the worker processes of
+    `HeadlessGame`.
+
+    :return: (a list of fitness values, one for each genome, the number of CGP evaluations)
+    """
+    brains = [cgp.Individual.from_bytes(genome) for genome in genomes]
+    world = World(course=get_course(course_spec))
+    world.reset(brains)
+    world.run()
+    return [brain.fitness for brain in brains], world.n_evals
+
+
+class Evolution:
+    """
+    The state of evolution and the steps of each generation shared by `game.Game` and `HeadlessGame`, which fly the
+    birds of the population `pop` in the world `_world` between `_begin_generation` and `_evolve`.
+    """
+
+    def _init_evolution(self):
+        self.n_birds = MU + LAMBDA
+        self._max_score_so_far = 0  # max score so far in all the rounds since the game started
+        self._max_score = 0  # max score of all the birds in this round (generation)
+        self.current_generation = 0
+        self.n_evals = 0  # number of CGP evaluations in this round
+        self.telemetry = None  # see `telemetry.Telemetry`
+        # steady-state evolution (see STEADY_STATE), where each bird is replaced as soon as it dies
+        self.steady_state = cgp.SteadyState(MU, STEADY_STATE_REPLACEMENT, TOURNAMENT_SIZE) if STEADY_STATE else None
+        self._mut_rate = adaptive_mutation_rate(0)  # mutation rate of the children in steady-state evolution
+        # create the initial population
+        self.pop = cgp.create_population(self.n_birds)
+
+    def _begin_generation(self):
+        if VERBOSE:
+            print(f'--------Generation: {self.current_generation}. Max score so far: {self._max_score_so_far}-------')
+        self._max_score = 0
+        self.current_generation += 1
+        if self.telemetry is not None:
+            self.telemetry.begin_generation()
+
+    def _evolve(self):
+        """
+        Evolve the population once the birds of a generation have been evaluated. In steady-state evolution, only the
+        mutation rate of the next children is updated, and the birds still flying are scored so far.
+        """
+        if self.steady_state is not None:
+            score_flying_birds(self._world)
+        mut_rate = adaptive_mutation_rate(self._max_score)
+        if self.telemetry is not None:
+            self.telemetry.end_generation(self, mut_rate)
+        if self.steady_state is None:
+            self.pop = cgp.evolve(self.pop, mut_rate, MU, LAMBDA)
+        else:
+            self._mut_rate = mut_rate
+
+
+class HeadlessGame(Evolution):
+    """
+    A drop-in replacement of `game.Game` for training without rendering.
+    """
+
+    def __init__(self, n_workers=N_WORKERS):
+        """
+        :param n_workers: number of worker processes to evaluate the birds. If None, evaluate them in this process.
+        """
+        self.running = True
+        self._init_evolution()
+        if self.steady_state is not None and n_workers is not None:
+            raise ValueError('Steady-state evolution requires the birds to be evaluated in this process')
+        self._world = World()
+        self._course = COURSE  # the course of the current round if all birds share one
+        # on a fixed course, individuals with the same phenotype get the same fitness: only fly one of them. A fitness
+        # capped by the wall time budget may differ in another run, though.
+        self._fitness_cache = (cgp.FitnessCache(FITNESS_CACHE_SIZE)
+                               if COURSE is not None and MAX_EVAL_SECONDS is None else None)
+        self._flying = []  # [(individual, duplicates with the same phenotype)] flying in this round
+        self._n_workers = n_workers
+        self._executor = ProcessPoolExecutor(n_workers) if n_workers is not None else None
+
+    def reset(self):
+        if VERBOSE and self._fitness_cache is not None:
+            print(f'Fitness cache hits: {self._fitness_cache.hits}, misses: {self._fitness_cache.misses}')
+        self._begin_generation()
+        if self.steady_state is not None:
+            if self._world.n_alive == 0:  # otherwise, the birds keep flying in the new generation
+                self._world.course = get_course(self._course) if self._course is not None else None
+                self._world.reset(self.pop)
+            return
+        if self._executor is not None and COURSE is None:
+            # all the workers must fly their birds on the same course in this round
+            self._course = random.getrandbits(32)
+        if self._course is None:
+            self._flying = [(ind, []) for ind in self.pop]
+        else:
+            self._flying = []
+            first_of_phenotype = {}
+            for ind in self.pop:
+                fitness = self._fitness_cache.get(ind, self._course) if self._fitness_cache is not None else None
+                if fitness is not None:
+                    ind.fitness = fitness
+                elif ind.phenotype_key() in first_of_phenotype:
+                    first_of_phenotype[ind.phenotype_key()][1].append(ind)
+                else:
+                    first_of_phenotype[ind.phenotype_key()] = (ind, [])
+                    self._flying.append(first_of_phenotype[ind.phenotype_key()])
+        if self._executor is None:
+            self._world.course = get_course(self._course) if self._course is not None else None
+            self._world.reset([ind for ind, _ in self._flying])
+
+    def _run_in_parallel(self):
+        """
+        Evaluate the flying individuals with the worker processes, each of which flies a chunk of them.
+        """
+        individuals = [ind for ind, _ in self._flying]
+        n_chunks = min(self._n_workers, len(individuals))
+        chunks = [individuals[i::n_chunks] for i in range(n_chunks)]
+        results = self._executor.map(evaluate_genomes, itertools.repeat(self._course),
+                                     [[ind.to_bytes() for ind in chunk] for chunk in chunks])
+        self.n_evals = 0
+        for chunk, (scores, n_evals) in zip(chunks, results):
+            for ind, score in zip(chunk, scores):
+                ind.fitness = score
+            self.n_evals += n_evals
+
+    def _run_steady_state(self):
+        """
+        Fly the birds until MU + LAMBDA of them have died, each of which is replaced by a child immediately.
+        """
+        world = self._world
+        self.n_evals = n_evaluated = 0
+        while n_evaluated < self.n_birds:
+            self.n_evals += world.flap_birds()[0]
+            world.update()
+            self._max_score = max(self._max_score, int(world.score.max()))
+            n_evaluated += refill_slots(world, self.steady_state, self.pop, self._mut_rate)
+
+    def run(self):
+        if self.steady_state is not None:
+            self._run_steady_state()
+        else:
+            if self._executor is None:
+                self._world.run()
+                self.n_evals = self._world.n_evals
+            else:
+                self._run_in_parallel()
+            for ind, duplicates in self._flying:
+                if self._fitness_cache is not None:
+                    self._fitness_cache.put(ind, ind.fitness, self._course)
+                for duplicate in duplicates:
+                    duplicate.fitness = ind.fitness
+            self._max_score = int(max(ind.fitness for ind in self.pop))
+        self._max_score_so_far = max(self._max_score_so_far, self._max_score)
+        # one generation finished and perform evolution again
+        self._evolve()
+
+
+def check_parity(seed=RANDOM_SEED, n_worlds=20, n_birds=1000, n_values=100000):
+    """
+    Check that the vectorized physics of the world reproduces pygame, with which the original sprites moved, rotated
+    and collided:
+
+    - the birds killed by `World.kill_crashed_birds` against `pygame.Rect.colliderect` of each bird with each pipe and
+      the boundary test, for random birds among the pipes of *n_worlds* worlds with *n_birds* birds each, which are
+      tested one by one in every other world (see SCALAR_MAX_BIRDS)
+    - `rotated_sizes` and `rotated_bird_size` against the size of the surface returned by `pygame.transform.rotate` at
+      every bird angle
+    - `round_coords` and `round_coord` against assigning *n_values* float coordinates to a `pygame.Rect`
+
+    :return: True if all the checks pass
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    import pygame as pg
+
+    rng = np.random.default_rng(seed)
+    results = {}
+
+    # collisions: random birds of any rotated size around all the pipes
+    _, widths, heights = _ROTATED_BIRD_SIZES
+    same = True
+    for i_world in range(n_worlds):
+        world = World(rng=random.Random(seed + i_world))
+        world._scalar_max_birds = n_birds if i_world % 2 else 0
+        world.reset([None] * n_birds)
+        k = rng.integers(len(widths), size=n_birds)
+        world.w, world.h = widths[k], heights[k]
+        world.x = rng.integers(-80, SCREEN_WIDTH + 20, size=n_birds)
+        world.y = rng.integers(-80, SCREEN_HEIGHT + 20, size=n_birds)
+        pipes = [pg.Rect(pipe.x, pipe.y, pipe.w, pipe.h) for pipe in world.pipes]
+        expected_crashed, expected_outside = [], []
+        for id_, x, y, w, h in zip(world.ids.tolist(), world.x.tolist(), world.y.tolist(), world.w.tolist(),
+                                   world.h.tolist()):
+            rect = pg.Rect(x, y, w, h)
+            outside = rect.top > SCREEN_HEIGHT or rect.bottom < 0
+            if outside or rect.collidelist(pipes) >= 0:
+                expected_crashed.append(id_)
+                expected_outside.append(outside)
+        world.kill_crashed_birds()
+        same = (same and world.crashed.tolist() == expected_crashed and
+                world.crashed_outside.tolist() == expected_outside)
+    results[f'collisions of {n_worlds * n_birds} birds'] = same
+
+    # rotation: every angle of `bird_angle` reached by a speed in [JUMP_SPEED - 1, BIRD_MAX_Y_SPEED + 1]
+    image = pg.Surface((BIRD_WIDTH, BIRD_HEIGHT), pg.SRCALPHA)
+    vel_y = np.linspace(JUMP_SPEED - 1, BIRD_MAX_Y_SPEED + 1, 10001)
+    expected = np.array([pg.transform.rotate(image, bird_angle(v)).get_size() for v in vel_y.tolist()]).T
+    results[f'rotated sizes at {len(set(map(bird_angle, vel_y.tolist())))} angles'] = bool(
+        np.array_equal(rotated_sizes(vel_y), expected) and
+        np.array_equal(np.array([rotated_bird_size(v) for v in vel_y.tolist()]).T, expected))
+
+    # rounding: random coordinates and all the halves in a range, where the rounding direction matters
+    values = np.concatenate([rng.uniform(-1000, 1000, n_values), np.arange(-1000, 1000) + 0.5])
+    rect = pg.Rect(0, 0, 1, 1)
+    expected = []
+    for value in values.tolist():
+        rect.y = value
+        expected.append(rect.y)
+    results[f'rounding of {len(values)} coordinates'] = bool(
+        np.array_equal(round_coords(values), expected) and [round_coord(v) for v in values.tolist()] == expected)
+
+    for name, same in results.items():
+        print(f'{name.capitalize()}: same as pygame: {same}')
+    return all(results.values())
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(0 if check_parity() else 1)